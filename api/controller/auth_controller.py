@@ -20,23 +20,21 @@ class AuthController:
         Handle user registration
         """
         try:
-            # Check if user already exists
-            existing_user = await user_service.get_user_by_username(user_data.username)
-            if existing_user:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Username already registered"
-                )
-            
             # Hash password
             hashed_password = get_password_hash(user_data.password)
             
-            # Create user
-            user = await user_service.create_user(
-                username=user_data.username,
-                hashed_password=hashed_password,
-                email=user_data.email
-            )
+            # Create user (the unique index rejects an existing username)
+            try:
+                user = await user_service.create_user(
+                    username=user_data.username,
+                    hashed_password=hashed_password,
+                    email=user_data.email
+                )
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(e)
+                )
             
             logger.info(f"User {user_data.username} registered successfully")
             
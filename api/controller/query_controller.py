@@ -13,6 +13,7 @@ from schema.query_schema import (
 )
 from service.features.sql_analysis_service import sql_analysis_service
 from service.features.sql_generation_service import sql_generation_service
+import service.features.database_visualization_service as viz_module
 
 logger = logging.getLogger(__name__)
 
@@ -152,7 +153,8 @@ class QueryController:
             generated_sql = await sql_generation_service.generate_sql(
                 natural_language_query=nl_query,
                 formatted_schema=formatted_schema,
-                model=query_request.model
+                model=query_request.model,
+                database_type=schema.get("database_type")
             )
             
             # Step 4: Execute query (validation happens inside execute_query)
@@ -249,6 +251,8 @@ class QueryController:
             # Remove from cache
             if connection_id in self._schema_cache:
                 del self._schema_cache[connection_id]
+            if viz_module.database_visualization_service:
+                viz_module.database_visualization_service.invalidate(connection_id)
             
             # Disconnect
             success = self.sql_analysis_service.disconnect_database(connection_id)
@@ -44,7 +44,7 @@ class RAGController:
             from service.rag.parent_chunks_service import parent_chunks_service
 
             # 1. Get the documents to retrieve metadata (chunk_ids, parent_ids) before deletion
-            existing_docs = await user_documents_service.get_user_documents(username)
+            existing_docs = await user_documents_service.get_user_documents_full(username)
             target_docs = [doc for doc in existing_docs if doc.get('filename') in filenames]
             
             if not target_docs:
@@ -275,12 +275,6 @@ class RAGController:
         # 1. Extract text from the uploaded file
         extracted_data = await file_processing_service.extract_text_from_file(file)
 
-        # 1.1 Deduplication Check: Remove existing document with same name
-        existing_docs = await user_documents_service.get_user_documents(user.get('username'))
-        if any(doc.get('filename') == file.filename for doc in existing_docs):
-            logger.info(f"Document '{file.filename}' already exists. Replacing it...")
-            await self.delete_documents([file.filename], user)
-
         # 2. Generate a description using Gemini or Groq
         from service.rag.gemini_service import gemini_service
         from service.rag.groq_service import groq_service
@@ -314,12 +308,13 @@ class RAGController:
             }
         )
 
-        # 4. Reuse the existing indexing logic
+        # 4. Reuse the existing indexing logic (replaces any existing document with the same name)
         return await self.process_and_index_document(doc_payload, user, file.filename)
 
     async def process_and_index_document(self, doc_payload: DocumentPayload, user: Dict[str, Any], filename: Optional[str] = None) -> Dict[str, Any]:
         """
         Orchestrates the indexing process:
+        0. Remove an existing document with the same filename, so (username, filename) stays unique.
         1. Run the core RAG indexing module (Chunking -> Embedding -> Pinecone).
         2. Save document metadata to MongoDB (User Documents) with the generated IDs.
         """
@@ -334,6 +329,12 @@ class RAGController:
         logger.info(f"Processing and indexing document '{filename}' for user '{username}'")
 
         try:
+            # 0. Deduplication Check: Remove existing document with same name
+            existing_docs = await user_documents_service.get_user_documents(username)
+            if any(doc.get('filename') == filename for doc in existing_docs):
+                logger.info(f"Document '{filename}' already exists. Replacing it...")
+                await self.delete_documents([filename], user)
+
             # 1. Prepare data for indexing module
             indexing_input = {
                 "content": doc_payload.content,
@@ -356,14 +357,24 @@ class RAGController:
                       logger.warning("Indexing returned 0 chunks.")
                  
             # 3. Save to User Documents (MongoDB)
-            doc_record = await user_documents_service.add_document(
-                username=username,
-                title=doc_payload.title,
-                filename=filename,
-                chunk_ids=chunk_ids,
-                parent_ids=parent_ids,
-                description=doc_payload.metadata.get("description")
-            )
+            try:
+                doc_record = await user_documents_service.add_document(
+                    username=username,
+                    title=doc_payload.title,
+                    filename=filename,
+                    chunk_ids=chunk_ids,
+                    parent_ids=parent_ids,
+                    description=doc_payload.metadata.get("description")
+                )
+            except Exception:
+                # Don't leave the just-written vectors and parent chunks orphaned
+                from service.rag.pinecone_service import pinecone_service
+                from service.rag.parent_chunks_service import parent_chunks_service
+                if chunk_ids:
+                    await pinecone_service.delete_vectors_by_chunk_ids(chunk_ids)
+                if parent_ids:
+                    await parent_chunks_service.delete_parent_chunks(parent_ids)
+                raise
             
             logger.info(f"Document '{filename}' successfully processed and stored for user '{username}'.")
             
@@ -0,0 +1,50 @@
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+import time
+
+
+class TTLCache:
+    """
+    In-process LRU cache whose entries expire after a TTL. Expired entries are dropped
+    when read; the least recently used entry is evicted once the cache is full.
+    Entries set without any TTL (none passed and no default) never expire.
+
+    Not thread-safe; meant to be used from the event loop.
+    """
+
+    def __init__(self, max_entries: int, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        # Default TTL for set() calls that don't pass one
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Returns the cached value for key, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Caches value under key for ttl seconds (the cache's default TTL if not given)."""
+        if ttl is None:
+            ttl = self.ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else float("inf")
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def evict(self, predicate: Callable[[Hashable, Any], bool]) -> None:
+        """Drops every entry for which predicate(key, value) is true."""
+        stale = [key for key, (_, value) in self._entries.items() if predicate(key, value)]
+        for key in stale:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -19,6 +19,13 @@ class Settings(BaseSettings):
     
     # Embedding Configuration
     embedding_dim: int = int(os.getenv("EMBEDDING_DIM", "768"))  # For FastEmbed (BGE Base)
+    # ONNX Runtime intra-op threads per process; with several Uvicorn workers, set this
+    # to roughly cpu_count / workers so they don't oversubscribe the cores
+    embedding_threads: Optional[int] = int(os.getenv("EMBEDDING_THREADS")) if os.getenv("EMBEDDING_THREADS") else None
+    # Comma-separated ONNX Runtime execution providers in priority order, e.g.
+    # "CUDAExecutionProvider,CPUExecutionProvider" (needs fastembed-gpu) or
+    # "OpenVINOExecutionProvider,CPUExecutionProvider". Unset means CPU only
+    embedding_providers: Optional[str] = os.getenv("EMBEDDING_PROVIDERS")
     
     # Database (for future use if needed)
     database_url: Optional[str] = os.getenv("DATABASE_URL")
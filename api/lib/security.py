@@ -2,7 +2,7 @@ from cryptography.fernet import Fernet
 import base64
 import hashlib
 from lib.config import settings
-from typing import Optional
+from typing import Dict, Optional
 
 class SecurityService:
     def __init__(self):
@@ -30,4 +30,17 @@ class SecurityService:
         except Exception:
             return None
 
+    def decrypt_values(self, encrypted_values: Dict[str, str]) -> Dict[str, str]:
+        """Decrypt a mapping of values, dropping any that are empty or fail to decrypt."""
+        decrypt = self.cipher.decrypt
+        decrypted = {}
+        for name, encrypted_value in encrypted_values.items():
+            if not encrypted_value:
+                continue
+            try:
+                decrypted[name] = decrypt(encrypted_value.encode()).decode()
+            except Exception:
+                continue
+        return decrypted
+
 security_service = SecurityService()
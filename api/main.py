@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
@@ -14,6 +15,8 @@ from routes.visualization import router as visualization_router
 from service.infrastructure.database_service import database_service
 from service.rag.pinecone_service import pinecone_service
 from service.rag.gemini_service import gemini_service
+from service.rag.embedding_service import embedding_service
+from service.features.file_processing_service import file_processing_service
 from service.features.sql_analysis_service import sql_analysis_service
 from service.features.database_visualization_service import DatabaseVisualizationService
 import service.features.database_visualization_service as viz_service_module
@@ -53,6 +56,9 @@ async def lifespan(app: FastAPI):
         logger.error(f"Failed to initialize Gemini: {e}")
 
     logger.info("Initialized Groq service.")
+
+    # Warm up the local embedding model so the first upload/query doesn't pay for it
+    await asyncio.to_thread(embedding_service.warmup)
     
     # Initialize Database Visualization Service
     try:
@@ -67,6 +73,7 @@ async def lifespan(app: FastAPI):
     logger.info("Shutting down QueryWise API...")
     await database_service.close()
     logger.info("MongoDB connection closed.")
+    file_processing_service.shutdown()
 
 # --- FastAPI application ---
 app = FastAPI(
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from typing import Dict, Any
 from pydantic import BaseModel
 from typing import List, Optional
@@ -10,6 +11,8 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+_PDF_CHUNK_SIZE = 64 * 1024
+
 router = APIRouter(prefix="/export", tags=["export"])
 
 class ExportPDFRequest(BaseModel):
@@ -30,7 +33,7 @@ async def export_to_pdf(
         logger.info(f"User '{username}' requested PDF export")
         
         # Generate PDF
-        pdf_buffer = pdf_export_service.generate_chat_pdf(
+        pdf_file = pdf_export_service.generate_chat_pdf(
             query=request.query,
             answer=request.answer,
             sources=request.sources,
@@ -42,13 +45,15 @@ async def export_to_pdf(
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"rag_response_{timestamp}.pdf"
         
-        # Return as streaming response
+        # Return as streaming response, reading the spooled PDF in fixed-size chunks
+        # and closing (and removing, if it spilled to disk) the file once sent
         return StreamingResponse(
-            pdf_buffer,
+            iter(lambda: pdf_file.read(_PDF_CHUNK_SIZE), b""),
             media_type="application/pdf",
             headers={
                 "Content-Disposition": f"attachment; filename={filename}"
-            }
+            },
+            background=BackgroundTask(pdf_file.close)
         )
         
     except Exception as e:
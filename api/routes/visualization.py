@@ -5,7 +5,7 @@ Provides endpoints for extracting visualization metadata from any connected SQL
 Database-agnostic design - works with PostgreSQL, MySQL, SQLite, etc.
 """
 
-from fastapi import APIRouter, status, HTTPException
+from fastapi import APIRouter, status, HTTPException, Response
 from schema.visualization_schema import (
     DatabaseVisualizationRequest,
     DatabaseVisualizationResponse,
@@ -35,7 +35,7 @@ async def get_visualization_metadata(
     
     This endpoint provides:
     - Complete schema information for all tables
-    - Row counts per table
+    - Row counts per table (catalog estimates unless `exact_counts` is true)
     - Column data types and categories
     - Statistical summaries for numeric columns
     - Auto-generated chart configurations (rule-based, no ML)
@@ -47,7 +47,9 @@ async def get_visualization_metadata(
     {
         "connection_id": "abc-123-xyz",
         "include_statistics": true,
-        "max_tables": 10
+        "max_tables": 10,
+        "exact_counts": false,
+        "include_row_counts": true
     }
     ```
     
@@ -72,7 +74,9 @@ async def get_visualization_metadata(
     result = await viz_module.database_visualization_service.get_database_visualization_metadata(
         connection_id=request.connection_id,
         include_statistics=request.include_statistics,
-        max_tables=request.max_tables
+        max_tables=request.max_tables,
+        exact_counts=request.exact_counts,
+        include_row_counts=request.include_row_counts
     )
     
     if not result.success:
@@ -81,7 +85,8 @@ async def get_visualization_metadata(
             detail=result.error or "Failed to get visualization metadata"
         )
     
-    return result
+    # Responses are cached by the service; reuse their pre-rendered JSON bytes
+    return Response(content=result.json_bytes(), media_type="application/json")
 
 
 @router.post(
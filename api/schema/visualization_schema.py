@@ -3,7 +3,7 @@ Schema definitions for database visualization endpoints.
 These schemas are database-agnostic and work with any SQL database connection.
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 from typing import List, Dict, Any, Optional
 from enum import Enum
 
@@ -19,6 +19,8 @@ class ColumnDataType(str, Enum):
 
 class ColumnMetadata(BaseModel):
     """Metadata for a single database column"""
+    model_config = ConfigDict(extra='forbid', frozen=True)
+
     name: str = Field(..., description="Column name")
     data_type: str = Field(..., description="Original SQL data type (e.g., 'INTEGER', 'VARCHAR')")
     category: ColumnDataType = Field(..., description="Categorized type for visualization logic")
@@ -29,6 +31,8 @@ class ColumnMetadata(BaseModel):
 
 class NumericColumnStats(BaseModel):
     """Statistics for numeric columns"""
+    model_config = ConfigDict(extra='forbid', frozen=True)
+
     column_name: str
     count: int = Field(..., description="Non-null value count")
     min_value: Optional[float] = Field(None, description="Minimum value")
@@ -39,8 +43,11 @@ class NumericColumnStats(BaseModel):
 
 class TableMetadata(BaseModel):
     """Metadata for a single database table"""
+    model_config = ConfigDict(extra='forbid', frozen=True)
+
     table_name: str = Field(..., description="Name of the table")
-    row_count: int = Field(..., description="Total number of rows in the table")
+    row_count: Optional[int] = Field(None, description="Total number of rows in the table (None if not requested)")
+    row_count_is_estimate: bool = Field(default=False, description="Whether row_count comes from catalog statistics")
     columns: List[ColumnMetadata] = Field(..., description="List of columns with metadata")
     numeric_columns: List[str] = Field(default_factory=list, description="Names of numeric columns")
     timestamp_columns: List[str] = Field(default_factory=list, description="Names of timestamp columns")
@@ -50,8 +57,10 @@ class TableMetadata(BaseModel):
 
 class TableStatistics(BaseModel):
     """Statistical data for a table"""
+    model_config = ConfigDict(extra='forbid', frozen=True)
+
     table_name: str
-    row_count: int
+    row_count: Optional[int] = None
     numeric_stats: List[NumericColumnStats] = Field(default_factory=list, description="Stats for numeric columns")
 
 
@@ -67,6 +76,8 @@ class ChartConfig(BaseModel):
     Configuration for a single chart visualization.
     This is a declarative config that the frontend can render with any chart library.
     """
+    model_config = ConfigDict(extra='forbid', frozen=True)
+
     chart_id: str = Field(..., description="Unique identifier for this chart")
     chart_type: str = Field(..., description="Type: 'bar', 'line', 'pie', 'table'")
     title: str = Field(..., description="Chart title")
@@ -83,6 +94,8 @@ class DatabaseVisualizationRequest(BaseModel):
     connection_id: str = Field(..., description="Active database connection ID")
     include_statistics: bool = Field(default=True, description="Whether to include statistical summaries")
     max_tables: Optional[int] = Field(None, description="Limit number of tables to analyze (for performance)")
+    exact_counts: bool = Field(default=False, description="Use exact COUNT(*) row counts instead of catalog estimates")
+    include_row_counts: bool = Field(default=True, description="Whether to compute row counts at all")
 
 
 class DatabaseVisualizationResponse(BaseModel):
@@ -97,8 +110,17 @@ class DatabaseVisualizationResponse(BaseModel):
     statistics: List[TableStatistics] = Field(default_factory=list, description="Statistical summaries")
     suggested_charts: List[ChartConfig] = Field(default_factory=list, description="Auto-generated chart configs")
     total_tables: int = Field(..., description="Total number of tables")
-    total_rows: int = Field(..., description="Sum of rows across all tables")
+    total_rows: Optional[int] = Field(..., description="Sum of rows across all tables (None if row counts were skipped)")
     error: Optional[str] = Field(None, description="Error message if any")
+    
+    # Serialized JSON, rendered once and reused while the response is cached
+    _json_bytes: Optional[bytes] = PrivateAttr(default=None)
+    
+    def json_bytes(self) -> bytes:
+        """Return the JSON encoding of this response, serializing it only once."""
+        if self._json_bytes is None:
+            self._json_bytes = self.model_dump_json().encode()
+        return self._json_bytes
 
 
 class CustomVisualizationRequest(BaseModel):
@@ -112,7 +134,7 @@ class CustomVisualizationRequest(BaseModel):
     dimension_column: Optional[str] = Field(None, description="Column for grouping/x-axis")
     metric_column: str = Field(..., description="Column to aggregate (must be numeric for most charts)")
     aggregation: str = Field(default="count", description="Aggregation function: count, sum, avg, min, max")
-    limit: int = Field(default=20, description="Max number of data points")
+    limit: int = Field(default=20, description="Max number of data points (capped at 1000)")
     order_by: str = Field(default="desc", description="Sort order: asc or desc")
 
 
@@ -15,7 +15,7 @@ class ChatSessionService:
     async def get_collection(self):
         if database_service.db is None:
             await database_service.connect()
-        return database_service.db.chat_sessions
+        return database_service.chat_sessions
     
     async def create_session(self, username: str, title: str = "New Chat") -> Dict[str, Any]:
         """Create a new chat session for a user."""
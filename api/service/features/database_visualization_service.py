@@ -18,12 +18,21 @@ Performance optimizations:
 """
 
 from sqlalchemy import text, inspect
-from sqlalchemy.engine import Engine
-from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy.exc import DBAPIError, NoSuchTableError
+from sqlalchemy.sql import sqltypes
+from sqlalchemy.types import TypeEngine
+from sqlalchemy.engine import Engine, Connection, Dialect, Inspector
+from sqlalchemy.sql.elements import TextClause
+from typing import List, Dict, Any, Optional, Tuple, Union, AsyncIterator, FrozenSet
 import logging
 import asyncio
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from functools import partial
+import re
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, lru_cache
+from itertools import chain, islice
+from pydantic import TypeAdapter
+from lib.cache import TTLCache
 
 from schema.visualization_schema import (
     TableMetadata,
@@ -41,7 +50,278 @@ logger = logging.getLogger(__name__)
 
 # Thread pool for parallel table processing
 # SQLAlchemy engines are thread-safe by default (connection pooling)
-_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="db_viz_worker")
+_MAX_WORKERS = 4
+_executor = ThreadPoolExecutor(max_workers=_MAX_WORKERS, thread_name_prefix="db_viz_worker")
+
+# Max tables in flight at once; keeps the executor queue short on very large schemas
+_MAX_PENDING_TABLES = _MAX_WORKERS * 2
+
+# Only the first N numeric columns per table get statistics
+_MAX_STATS_COLUMNS = 5
+
+# Tables larger than this get statistics from a block sample (PostgreSQL only)
+_SAMPLE_STATS_ABOVE_ROWS = 10_000_000
+_STATS_SAMPLE_PERCENT = 1
+
+# Max tables shown in the overview bar and distribution pie charts
+_MAX_CHART_BARS = 50
+
+# Upper bound on data points returned by a custom visualization
+_MAX_CUSTOM_VIZ_LIMIT = 1000
+
+# How long a metadata response is reused while the schema fingerprint is unchanged
+_METADATA_CACHE_TTL_SECONDS = 60
+# Bound on cached metadata responses across all connections and request options
+_METADATA_CACHE_MAX_ENTRIES = 256
+
+# Cheap per-dialect "statistics changed" marker folded into the schema fingerprint
+_SCHEMA_VERSION_QUERIES = {
+    "postgresql": text(
+        "SELECT max(greatest(last_analyze, last_autoanalyze)) FROM pg_stat_user_tables"
+    ),
+}
+
+# Validates a whole table's column dicts in one call instead of one model init per column
+_column_list_adapter = TypeAdapter(List[ColumnMetadata])
+
+# Catalog-statistics row estimates per dialect (single catalog row instead of a table scan).
+# These run through the DBAPI driver directly; {t} is replaced by the driver's placeholder.
+_ROW_ESTIMATE_QUERIES = {
+    "postgresql": (
+        "SELECT c.reltuples::bigint FROM pg_class c "
+        "JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relname = {t} AND n.nspname = current_schema() AND c.relkind = 'r'"
+    ),
+    "mysql": (
+        "SELECT TABLE_ROWS FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = {t}"
+    ),
+    "sqlite": (
+        "SELECT stat FROM sqlite_stat1 WHERE tbl = {t} LIMIT 1"
+    ),
+    "mssql": (
+        "SELECT SUM(row_count) FROM sys.dm_db_partition_stats "
+        "WHERE object_id = OBJECT_ID({t}) AND index_id IN (0, 1)"
+    ),
+}
+
+# DBAPI paramstyle -> placeholder for a single bound value
+_DRIVER_PLACEHOLDERS = {
+    "qmark": "?",
+    "format": "%s",
+    "pyformat": "%s",
+    "numeric": ":1",
+    "named": ":t",
+}
+
+
+@lru_cache(maxsize=256)
+def _categorize_column_type(sql_type: str) -> ColumnDataType:
+    """
+    Categorize SQL data type into visualization-friendly categories.
+    Database-agnostic type mapping, cached since type strings repeat across columns.
+    
+    Args:
+        sql_type: SQL data type string (e.g., 'INTEGER', 'VARCHAR', 'TIMESTAMP')
+        
+    Returns:
+        ColumnDataType enum value
+    """
+    sql_type_upper = sql_type.upper()
+    
+    # Numeric types
+    if any(t in sql_type_upper for t in [
+        'INT', 'INTEGER', 'BIGINT', 'SMALLINT', 'TINYINT',
+        'DECIMAL', 'NUMERIC', 'FLOAT', 'DOUBLE', 'REAL',
+        'MONEY', 'NUMBER'
+    ]):
+        return ColumnDataType.NUMERIC
+    
+    # Timestamp/Date types
+    if any(t in sql_type_upper for t in [
+        'TIMESTAMP', 'DATETIME', 'DATE', 'TIME'
+    ]):
+        return ColumnDataType.TIMESTAMP
+    
+    # Boolean types
+    if any(t in sql_type_upper for t in ['BOOL', 'BOOLEAN', 'BIT']):
+        return ColumnDataType.BOOLEAN
+    
+    # Text types (default for VARCHAR, TEXT, CHAR, etc.)
+    if any(t in sql_type_upper for t in [
+        'CHAR', 'VARCHAR', 'TEXT', 'STRING', 'CLOB'
+    ]):
+        return ColumnDataType.TEXT
+    
+    return ColumnDataType.OTHER
+
+
+# Generic SQLAlchemy type classes -> category; dialect types subclass these
+_SA_TYPE_CATEGORY: Dict[type, ColumnDataType] = {
+    sqltypes.Integer: ColumnDataType.NUMERIC,
+    sqltypes.Numeric: ColumnDataType.NUMERIC,
+    sqltypes.DateTime: ColumnDataType.TIMESTAMP,
+    sqltypes.Date: ColumnDataType.TIMESTAMP,
+    sqltypes.Time: ColumnDataType.TIMESTAMP,
+    sqltypes.Boolean: ColumnDataType.BOOLEAN,
+    sqltypes.String: ColumnDataType.TEXT,
+}
+
+
+def _categorize_sa_type(sql_type: TypeEngine) -> ColumnDataType:
+    """
+    Categorize a reflected SQLAlchemy type by its class hierarchy.
+    
+    Falls back to the string-based categorization for dialect types that
+    do not derive from a generic SQLAlchemy type (e.g. MONEY, BIT).
+    
+    Args:
+        sql_type: Reflected SQLAlchemy type instance
+        
+    Returns:
+        ColumnDataType enum value
+    """
+    for cls in type(sql_type).__mro__:
+        category = _SA_TYPE_CATEGORY.get(cls)
+        if category is not None:
+            return category
+    return _categorize_column_type(str(sql_type))
+
+
+# ID-like column names: "id", "*id", "*_id", "*_key" or "fk_*"
+_ID_COLUMN_RE = re.compile(r'^fk_|(?:id|_key)\Z', re.IGNORECASE)
+
+
+@lru_cache(maxsize=4096)
+def _is_id_column(column_name: str) -> bool:
+    """
+    Heuristic to identify ID columns that shouldn't be visualized.
+    Cached since column names repeat across tables and requests.
+    
+    Args:
+        column_name: Name of the column
+        
+    Returns:
+        True if column appears to be an ID column
+    """
+    return _ID_COLUMN_RE.search(column_name) is not None
+
+
+@lru_cache(maxsize=32)
+def _row_estimate_sql(dialect_name: str, paramstyle: str) -> Optional[str]:
+    """
+    Render the driver-level row estimate query for a dialect and paramstyle.
+    
+    Args:
+        dialect_name: SQLAlchemy dialect name (e.g. 'postgresql')
+        paramstyle: DBAPI paramstyle used by the driver
+        
+    Returns:
+        SQL string ready for exec_driver_sql, or None if unsupported
+    """
+    template = _ROW_ESTIMATE_QUERIES.get(dialect_name)
+    placeholder = _DRIVER_PLACEHOLDERS.get(paramstyle)
+    if template is None or placeholder is None:
+        return None
+    return template.format(t=placeholder)
+
+
+@lru_cache(maxsize=1024)
+def _numeric_stats_stmt(
+    dialect: Dialect,
+    table_name: str,
+    column_names: Tuple[str, ...],
+    sample_percent: Optional[int] = None
+) -> TextClause:
+    """
+    Build (once per dialect/table/columns) the fused aggregate statistics query.
+    
+    Each column contributes COUNT, MIN, MAX, AVG, SUM in that order; results are
+    read positionally. Identifiers are quoted by the dialect (backticks on MySQL,
+    brackets on MSSQL).
+    
+    Args:
+        dialect: SQLAlchemy dialect of the target engine
+        table_name: Name of the table
+        column_names: Numeric columns to aggregate
+        sample_percent: Aggregate over a TABLESAMPLE SYSTEM block sample of this size
+        
+    Returns:
+        Reusable TextClause for the statistics query
+    """
+    preparer = dialect.identifier_preparer
+    select_parts = []
+    for col_name in column_names:
+        quoted = preparer.quote(col_name)
+        select_parts.append(
+            f"COUNT({quoted}), MIN({quoted}), MAX({quoted}), AVG({quoted}), SUM({quoted})"
+        )
+    source = preparer.quote(table_name)
+    if sample_percent:
+        source += f" TABLESAMPLE SYSTEM ({int(sample_percent)})"
+    return text(f"SELECT {', '.join(select_parts)} FROM {source}")
+
+
+@lru_cache(maxsize=1024)
+def _custom_viz_stmt(
+    dialect: Dialect,
+    table_name: str,
+    dimension_column: Optional[str],
+    metric_column: str,
+    aggregation: str,
+    order: str
+) -> TextClause:
+    """
+    Build (once per parameter combination) the custom visualization query.
+    
+    Grouped queries take the row limit as the :limit bind parameter so one
+    statement serves every limit value.
+    
+    Args:
+        dialect: SQLAlchemy dialect of the target engine
+        table_name: Name of the table
+        dimension_column: Column to group by, or None for a single aggregate
+        metric_column: Column to aggregate
+        aggregation: Validated aggregation name (count, sum, avg, min, max)
+        order: Validated sort order (ASC or DESC)
+        
+    Returns:
+        Reusable TextClause for the custom visualization query
+    """
+    preparer = dialect.identifier_preparer
+    table = preparer.quote(table_name)
+    metric = preparer.quote(metric_column)
+    agg_func = aggregation.upper()
+    
+    if dimension_column:
+        # Grouped query
+        dimension = preparer.quote(dimension_column)
+        
+        # Rows are already filtered to non-NULL dimension values, so counting the
+        # dimension itself is COUNT(*), which planners can answer from an index
+        if aggregation == 'count' and metric_column == dimension_column:
+            aggregate = "COUNT(*)"
+        else:
+            aggregate = f"{agg_func}({metric})"
+        
+        return text(f'''
+            SELECT 
+                {dimension} as dimension,
+                {aggregate} as value
+            FROM {table}
+            WHERE {dimension} IS NOT NULL
+            GROUP BY {dimension}
+            ORDER BY value {order}
+            LIMIT :limit
+        ''')
+    
+    # Single aggregate value
+    return text(f'''
+        SELECT 
+            '{aggregation}' as dimension,
+            {agg_func}({metric}) as value
+        FROM {table}
+    ''')
 
 
 class DatabaseVisualizationService:
@@ -58,45 +338,146 @@ class DatabaseVisualizationService:
             sql_analysis_service: Instance of SQLAnalysisService for DB connections
         """
         self.sql_analysis_service = sql_analysis_service
+        # connection_id -> {table_name: column names, or None if missing}; avoids re-inspecting on every custom viz
+        self._schema_cache: Dict[str, Dict[str, Optional[FrozenSet[str]]]] = {}
+        # connection_id -> Inspector; keeps the reflection info_cache warm across requests
+        self._inspectors: Dict[str, Inspector] = {}
+        # (connection_id, options...) -> (schema fingerprint, response)
+        self._viz_cache = TTLCache(_METADATA_CACHE_MAX_ENTRIES, _METADATA_CACHE_TTL_SECONDS)
+        # dialect name -> {type class: category}, built once from the dialect's type registry
+        self._type_maps: Dict[str, Dict[type, ColumnDataType]] = {}
     
-    def _categorize_column_type(self, sql_type: str) -> ColumnDataType:
+    def _get_type_map(self, dialect: Dialect) -> Dict[type, ColumnDataType]:
         """
-        Categorize SQL data type into visualization-friendly categories.
-        Database-agnostic type mapping.
+        Get the type-class -> category map for a dialect, building it on first use.
+        
+        Walks every type class the dialect can reflect (``ischema_names``) once and
+        records those that derive from a generic SQLAlchemy type.
         
         Args:
-            sql_type: SQL data type string (e.g., 'INTEGER', 'VARCHAR', 'TIMESTAMP')
+            dialect: SQLAlchemy dialect
             
         Returns:
-            ColumnDataType enum value
+            Dict mapping reflected type classes to ColumnDataType
+        """
+        type_map = self._type_maps.get(dialect.name)
+        if type_map is None:
+            type_map = {}
+            for type_cls in set(getattr(dialect, "ischema_names", {}).values()):
+                for cls in type_cls.__mro__:
+                    category = _SA_TYPE_CATEGORY.get(cls)
+                    if category is not None:
+                        type_map[type_cls] = category
+                        break
+            self._type_maps[dialect.name] = type_map
+        return type_map
+    
+    def _get_inspector(self, connection_id: str, engine: Engine) -> Inspector:
         """
-        sql_type_upper = sql_type.upper()
+        Get the cached inspector for a connection, creating it on first use.
         
-        # Numeric types
-        if any(t in sql_type_upper for t in [
-            'INT', 'INTEGER', 'BIGINT', 'SMALLINT', 'TINYINT',
-            'DECIMAL', 'NUMERIC', 'FLOAT', 'DOUBLE', 'REAL',
-            'MONEY', 'NUMBER'
-        ]):
-            return ColumnDataType.NUMERIC
+        Args:
+            connection_id: Active database connection ID
+            engine: SQLAlchemy engine for the connection
+            
+        Returns:
+            SQLAlchemy Inspector bound to the engine
+        """
+        inspector = self._inspectors.get(connection_id)
+        if inspector is None or inspector.bind is not engine:
+            inspector = inspect(engine)
+            self._inspectors[connection_id] = inspector
+        return inspector
+    
+    def invalidate(self, connection_id: str) -> None:
+        """
+        Drop cached inspector and schema data for a connection.
         
-        # Timestamp/Date types
-        if any(t in sql_type_upper for t in [
-            'TIMESTAMP', 'DATETIME', 'DATE', 'TIME'
-        ]):
-            return ColumnDataType.TIMESTAMP
+        Call after disconnecting or when the database schema has changed.
         
-        # Boolean types
-        if any(t in sql_type_upper for t in ['BOOL', 'BOOLEAN', 'BIT']):
-            return ColumnDataType.BOOLEAN
+        Args:
+            connection_id: Database connection ID
+        """
+        self._inspectors.pop(connection_id, None)
+        self._schema_cache.pop(connection_id, None)
+        self._viz_cache.evict(lambda key, _: key[0] == connection_id)
+    
+    def _get_schema_fingerprint(self, engine: Engine) -> Tuple[int, List[str]]:
+        """
+        Compute a cheap fingerprint of the database schema.
         
-        # Text types (default for VARCHAR, TEXT, CHAR, etc.)
-        if any(t in sql_type_upper for t in [
-            'CHAR', 'VARCHAR', 'TEXT', 'STRING', 'CLOB'
-        ]):
-            return ColumnDataType.TEXT
+        Reads table names directly from the dialect (bypassing the inspector's
+        reflection cache) plus, where supported, the latest statistics timestamp.
         
-        return ColumnDataType.OTHER
+        Args:
+            engine: SQLAlchemy engine
+            
+        Returns:
+            Tuple of (fingerprint, current table names)
+        """
+        with engine.connect() as conn:
+            table_names = engine.dialect.get_table_names(conn)
+            version = None
+            query = _SCHEMA_VERSION_QUERIES.get(engine.dialect.name)
+            if query is not None:
+                try:
+                    version = conn.execute(query).scalar()
+                except Exception as e:
+                    logger.debug(f"Schema version unavailable: {str(e)}")
+        return hash((tuple(table_names), version)), table_names
+    
+    def _get_cached_columns(
+        self,
+        engine: Engine,
+        connection_id: str,
+        table_name: str
+    ) -> Optional[FrozenSet[str]]:
+        """
+        Look up column names for a table, inspecting the database only on cache miss.
+        
+        Missing tables are cached as None too, until the next metadata rebuild.
+        
+        Args:
+            engine: SQLAlchemy engine
+            connection_id: Active database connection ID
+            table_name: Name of the table
+            
+        Returns:
+            Set of column names, or None if the table does not exist
+        """
+        tables = self._schema_cache.setdefault(connection_id, {})
+        if table_name in tables:
+            return tables[table_name]
+        
+        # Cache miss: the table may have been created after the schema was cached, so
+        # reflect it through the dialect directly, bypassing (and leaving intact) the
+        # inspector's reflection cache. This also tells us whether the table exists
+        # (one round-trip).
+        try:
+            with engine.connect() as conn:
+                columns_info = engine.dialect.get_columns(conn, table_name)
+        except NoSuchTableError:
+            tables[table_name] = None
+            return None
+        
+        column_names = frozenset(col['name'] for col in columns_info)
+        tables[table_name] = column_names
+        return column_names
+    
+    def _categorize_column_type(self, sql_type: Union[TypeEngine, str]) -> ColumnDataType:
+        """
+        Categorize SQL data type into visualization-friendly categories.
+        Delegates to the module-level implementations.
+        
+        Args:
+            sql_type: Reflected SQLAlchemy type, or SQL type string (e.g., 'INTEGER')
+            
+        Returns:
+            ColumnDataType enum value
+        """
+        if isinstance(sql_type, str):
+            return _categorize_column_type(sql_type)
+        return _categorize_sa_type(sql_type)
     
     def _is_id_column(self, column_name: str) -> bool:
         """
@@ -108,21 +489,14 @@ class DatabaseVisualizationService:
         Returns:
             True if column appears to be an ID column
         """
-        name_lower = column_name.lower()
-        return (
-            name_lower.endswith('_id') or 
-            name_lower.endswith('id') or
-            name_lower == 'id' or
-            name_lower.startswith('fk_') or
-            name_lower.endswith('_key')
-        )
+        return _is_id_column(column_name)
     
-    def _get_row_count(self, engine: Engine, table_name: str) -> int:
+    def _get_row_count(self, conn: Connection, table_name: str) -> int:
         """
         Safely get row count for a table using parameterized query.
         
         Args:
-            engine: SQLAlchemy engine
+            conn: Open SQLAlchemy connection
             table_name: Name of the table
             
         Returns:
@@ -132,116 +506,260 @@ class DatabaseVisualizationService:
             # Use COUNT(*) which is safe and deterministic
             # Note: We cannot parameterize table names in standard SQL,
             # but we validate table name exists via SQLAlchemy inspector
-            with engine.connect() as conn:
-                result = conn.execute(
-                    text(f'SELECT COUNT(*) as count FROM "{table_name}"')
-                )
-                return result.fetchone()[0]
+            # and quote it with the dialect's rules (backticks on MySQL, etc.)
+            quoted_table = conn.dialect.identifier_preparer.quote(table_name)
+            result = conn.execute(
+                text(f'SELECT COUNT(*) as count FROM {quoted_table}')
+            )
+            return result.fetchone()[0]
         except Exception as e:
             logger.warning(f"Failed to get row count for {table_name}: {str(e)}")
             return 0
     
+    def _get_row_count_estimate(self, conn: Connection, table_name: str) -> Optional[int]:
+        """
+        Get an approximate row count from the database's catalog statistics.
+        
+        Args:
+            conn: Open SQLAlchemy connection
+            table_name: Name of the table
+            
+        Returns:
+            Estimated number of rows, or None if no usable estimate is available
+        """
+        dialect = conn.dialect
+        query = _row_estimate_sql(dialect.name, dialect.paramstyle)
+        if query is None:
+            return None
+        
+        # exec_driver_sql hands the string straight to the DBAPI cursor, skipping
+        # SQLAlchemy statement compilation for this tiny per-table catalog lookup
+        params = {"t": table_name} if dialect.paramstyle == "named" else (table_name,)
+        try:
+            row = conn.exec_driver_sql(query, params).fetchone()
+        except Exception as e:
+            # e.g. sqlite_stat1 does not exist until ANALYZE has been run
+            logger.debug(f"Row estimate unavailable for {table_name}: {str(e)}")
+            return None
+        
+        if not row or row[0] is None:
+            return None
+        
+        # sqlite_stat1.stat is a space-separated string whose first field is the row count
+        estimate = int(str(row[0]).split()[0])
+        
+        # Never-analyzed tables report -1 (or 0 on older PostgreSQL); count those exactly
+        return estimate if estimate > 0 else None
+    
     def _process_single_table(
         self,
         engine: Engine,
         table_name: str,
-        inspector,
-        include_statistics: bool
-    ) -> Tuple[Optional[TableMetadata], Optional[TableStatistics], int]:
+        reflection: Dict[str, Any],
+        include_statistics: bool,
+        exact_counts: bool = False,
+        include_row_counts: bool = True
+    ) -> Tuple[Optional[TableMetadata], Optional[TableStatistics], Optional[int]]:
         """
         Process a single table to extract metadata and statistics.
         
         This function runs in a worker thread for parallel processing.
-        Each thread gets its own DB connection from the engine's connection pool.
+        Each table checks out a single AUTOCOMMIT connection from the engine's pool
+        and reuses it for the row count and statistics queries.
         
         Args:
             engine: SQLAlchemy engine (thread-safe)
             table_name: Name of the table to process
-            inspector: SQLAlchemy inspector (cached, thread-safe for reads)
+            reflection: Pre-reflected columns, pk_constraint and foreign_keys for the table
             include_statistics: Whether to compute numeric statistics
+            exact_counts: Use COUNT(*) instead of catalog row estimates
+            include_row_counts: Whether to look up row counts at all
             
         Returns:
-            Tuple of (TableMetadata, TableStatistics or None, row_count)
+            Tuple of (TableMetadata, TableStatistics or None, row_count or None)
         """
         try:
             logger.info(f"[Worker Thread] Processing table: {table_name}")
             
-            # Get row count
-            row_count = self._get_row_count(engine, table_name)
-            
-            # Get columns metadata
-            columns_info = inspector.get_columns(table_name)
-            pk_constraint = inspector.get_pk_constraint(table_name)
-            fks = inspector.get_foreign_keys(table_name)
-            
-            primary_keys = pk_constraint.get('constrained_columns', []) if pk_constraint else []
-            foreign_key_columns = set()
-            for fk in fks:
-                foreign_key_columns.update(fk.get('constrained_columns', []))
-            
-            # Build column metadata
-            columns: List[ColumnMetadata] = []
-            numeric_columns = []
-            timestamp_columns = []
-            text_columns = []
-            
-            for col in columns_info:
-                col_name = col['name']
-                sql_type = str(col['type'])
-                category = self._categorize_column_type(sql_type)
-                
-                column_meta = ColumnMetadata(
-                    name=col_name,
-                    data_type=sql_type,
-                    category=category,
-                    nullable=col.get('nullable', True),
-                    is_primary_key=col_name in primary_keys,
-                    is_foreign_key=col_name in foreign_key_columns
+            # Schema-only request: everything comes from reflection, no queries needed
+            if not include_row_counts and not include_statistics:
+                return self._process_table_with_connection(
+                    None, engine.dialect, table_name, reflection,
+                    include_statistics, exact_counts, include_row_counts
                 )
-                columns.append(column_meta)
-                
-                # Categorize for easy access (skip ID columns for visualization)
-                if not self._is_id_column(col_name):
-                    if category == ColumnDataType.NUMERIC:
-                        numeric_columns.append(col_name)
-                    elif category == ColumnDataType.TIMESTAMP:
-                        timestamp_columns.append(col_name)
-                    elif category == ColumnDataType.TEXT:
-                        text_columns.append(col_name)
-            
-            # Create table metadata
-            table_meta = TableMetadata(
-                table_name=table_name,
-                row_count=row_count,
-                columns=columns,
-                numeric_columns=numeric_columns,
-                timestamp_columns=timestamp_columns,
-                text_columns=text_columns,
-                primary_keys=primary_keys
-            )
             
-            # Get statistics if requested (using batched query)
-            table_stats = None
-            if include_statistics and numeric_columns:
-                numeric_stats = self._get_table_statistics(engine, table_name, numeric_columns)
-                if numeric_stats:
-                    table_stats = TableStatistics(
-                        table_name=table_name,
-                        row_count=row_count,
-                        numeric_stats=numeric_stats
-                    )
-            
-            return table_meta, table_stats, row_count
+            # One pooled connection per table; AUTOCOMMIT skips BEGIN/COMMIT
+            # round-trips for these read-only aggregate queries
+            with engine.connect() as raw_conn:
+                conn = raw_conn.execution_options(isolation_level="AUTOCOMMIT")
+                return self._process_table_with_connection(
+                    conn, engine.dialect, table_name, reflection,
+                    include_statistics, exact_counts, include_row_counts
+                )
             
         except Exception as e:
             logger.error(f"[Worker Thread] Failed to process table {table_name}: {str(e)}")
             return None, None, 0
     
+    def _process_table_with_connection(
+        self,
+        conn: Optional[Connection],
+        dialect: Dialect,
+        table_name: str,
+        reflection: Dict[str, Any],
+        include_statistics: bool,
+        exact_counts: bool = False,
+        include_row_counts: bool = True
+    ) -> Tuple[Optional[TableMetadata], Optional[TableStatistics], Optional[int]]:
+        """
+        Extract metadata and statistics for a table over an already-open connection.
+        
+        Args:
+            conn: Open SQLAlchemy connection (AUTOCOMMIT), or None when no queries are needed
+            dialect: SQLAlchemy dialect of the engine
+            table_name: Name of the table to process
+            reflection: Pre-reflected columns, pk_constraint and foreign_keys for the table
+            include_statistics: Whether to compute numeric statistics
+            exact_counts: Use COUNT(*) instead of catalog row estimates
+            include_row_counts: Whether to look up row counts at all
+            
+        Returns:
+            Tuple of (TableMetadata, TableStatistics or None, row_count or None)
+        """
+        # Get row count (catalog estimate first, COUNT(*) when missing or requested)
+        row_count = None
+        row_count_is_estimate = False
+        if include_row_counts:
+            if not exact_counts:
+                row_count = self._get_row_count_estimate(conn, table_name)
+                row_count_is_estimate = row_count is not None
+            if row_count is None:
+                row_count = self._get_row_count(conn, table_name)
+        
+        # Columns metadata was reflected for all tables up front
+        columns_info = reflection["columns"]
+        pk_constraint = reflection["pk_constraint"]
+        fks = reflection["foreign_keys"]
+        
+        primary_keys = pk_constraint.get('constrained_columns', []) if pk_constraint else []
+        primary_key_set = frozenset(primary_keys)
+        foreign_key_columns = frozenset(
+            chain.from_iterable(fk.get('constrained_columns', ()) for fk in fks)
+        )
+        
+        # Classify columns using plain dicts; models are built in one batch below
+        type_map = self._get_type_map(dialect)
+        column_dicts: List[Dict[str, Any]] = []
+        numeric_columns = []
+        timestamp_columns = []
+        text_columns = []
+        buckets = {
+            ColumnDataType.NUMERIC: numeric_columns,
+            ColumnDataType.TIMESTAMP: timestamp_columns,
+            ColumnDataType.TEXT: text_columns,
+        }
+        
+        for col in columns_info:
+            col_name = col['name']
+            col_type = col['type']
+            category = type_map.get(type(col_type))
+            if category is None:
+                category = self._categorize_column_type(col_type)
+            
+            column_dicts.append({
+                "name": col_name,
+                "data_type": str(col_type),
+                "category": category,
+                "nullable": col.get('nullable', True),
+                "is_primary_key": col_name in primary_key_set,
+                "is_foreign_key": col_name in foreign_key_columns
+            })
+            
+            # Categorize for easy access (skip ID columns for visualization)
+            if _is_id_column(col_name):
+                continue
+            bucket = buckets.get(category)
+            if bucket is not None:
+                bucket.append(col_name)
+        
+        # Create table metadata
+        table_meta = TableMetadata(
+            table_name=table_name,
+            row_count=row_count,
+            row_count_is_estimate=row_count_is_estimate,
+            columns=_column_list_adapter.validate_python(column_dicts),
+            numeric_columns=numeric_columns,
+            timestamp_columns=timestamp_columns,
+            text_columns=text_columns,
+            primary_keys=primary_keys
+        )
+        
+        # Get statistics if requested (using batched query); empty tables have none
+        table_stats = None
+        if include_statistics and numeric_columns and row_count != 0:
+            numeric_stats = self._get_table_statistics(
+                conn, table_name, numeric_columns[:_MAX_STATS_COLUMNS], row_count
+            )
+            if numeric_stats:
+                table_stats = TableStatistics(
+                    table_name=table_name,
+                    row_count=row_count,
+                    numeric_stats=numeric_stats
+                )
+        
+        return table_meta, table_stats, row_count
+    
+    def _get_pool_size(self, engine: Engine) -> Optional[int]:
+        """
+        Get the number of persistent connections the engine's pool keeps.
+        
+        Args:
+            engine: SQLAlchemy engine
+            
+        Returns:
+            Pool size for sized pools (QueuePool), or None for unsized pools
+        """
+        size = getattr(engine.pool, "size", None)
+        return size() if callable(size) else None
+    
+    def _reflect_tables(
+        self,
+        inspector,
+        table_names: List[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Reflect columns, primary keys and foreign keys for many tables at once.
+        
+        Uses SQLAlchemy 2.0 multi-table reflection, which issues one query per
+        kind of metadata instead of one query per table.
+        
+        Args:
+            inspector: SQLAlchemy inspector
+            table_names: Tables to reflect (default schema)
+            
+        Returns:
+            Dict mapping table name to its columns, pk_constraint and foreign_keys
+        """
+        columns_map = inspector.get_multi_columns(filter_names=table_names)
+        pks_map = inspector.get_multi_pk_constraint(filter_names=table_names)
+        fks_map = inspector.get_multi_foreign_keys(filter_names=table_names)
+        
+        # Multi-reflection results are keyed by (schema, table); None is the default schema
+        return {
+            table_name: {
+                "columns": columns_map.get((None, table_name), []),
+                "pk_constraint": pks_map.get((None, table_name)),
+                "foreign_keys": fks_map.get((None, table_name), []),
+            }
+            for table_name in table_names
+        }
+    
     def _get_table_statistics(
         self, 
-        engine: Engine, 
+        conn: Connection, 
         table_name: str, 
-        numeric_columns: List[str]
+        numeric_columns: List[str],
+        row_count: Optional[int] = None
     ) -> List[NumericColumnStats]:
         """
         Get statistics for ALL numeric columns in a single batched query.
@@ -250,10 +768,14 @@ class DatabaseVisualizationService:
         we execute a single query with all aggregations. This dramatically reduces
         the N+1 query problem.
         
+        On PostgreSQL, tables above _SAMPLE_STATS_ABOVE_ROWS are aggregated over a
+        block sample; COUNT and SUM are scaled back up, so they are estimates.
+        
         Args:
-            engine: SQLAlchemy engine
+            conn: Open SQLAlchemy connection
             table_name: Name of the table
-            numeric_columns: List of numeric column names (limited to first 5 for performance)
+            numeric_columns: Numeric column names (callers pass at most _MAX_STATS_COLUMNS)
+            row_count: Known (or estimated) row count, used to decide on sampling
             
         Returns:
             List of NumericColumnStats
@@ -262,50 +784,47 @@ class DatabaseVisualizationService:
             return []
         
         try:
-            # Limit to first 5 numeric columns to avoid excessively long queries
-            columns_to_process = numeric_columns[:5]
-            
-            # Build a single SELECT with all aggregate functions for all columns
-            # This executes in one DB round-trip instead of N trips
-            select_parts = []
-            for col_name in columns_to_process:
-                # Each column gets: COUNT, MIN, MAX, AVG, SUM
-                select_parts.append(f'''
-                    COUNT("{col_name}") as "{col_name}_count",
-                    MIN("{col_name}") as "{col_name}_min",
-                    MAX("{col_name}") as "{col_name}_max",
-                    AVG("{col_name}") as "{col_name}_avg",
-                    SUM("{col_name}") as "{col_name}_sum"
-                '''.strip())
-            
-            query = text(f'''
-                SELECT {", ".join(select_parts)}
-                FROM "{table_name}"
-            ''')
+            # Guard against overly long queries if a caller passes more columns
+            columns_to_process = numeric_columns[:_MAX_STATS_COLUMNS]
+            
+            # Single SELECT with all aggregate functions for all columns
+            # This executes in one DB round-trip instead of N trips; the statement
+            # is built once per table/column set and reused across requests
+            sample_percent = None
+            if (
+                conn.dialect.name == "postgresql"
+                and row_count is not None
+                and row_count > _SAMPLE_STATS_ABOVE_ROWS
+            ):
+                sample_percent = _STATS_SAMPLE_PERCENT
+            scale = 100 / sample_percent if sample_percent else 1
+            
+            query = _numeric_stats_stmt(
+                conn.dialect, table_name, tuple(columns_to_process), sample_percent
+            )
             
             # Execute single batched query
-            with engine.connect() as conn:
-                result = conn.execute(query)
-                row = result.fetchone()
-                
-                if not row:
-                    return []
-                
-                # Parse results into NumericColumnStats objects
-                stats_list = []
-                for idx, col_name in enumerate(columns_to_process):
-                    # Results are in groups of 5: count, min, max, avg, sum
-                    base_idx = idx * 5
-                    stats_list.append(NumericColumnStats(
-                        column_name=col_name,
-                        count=row[base_idx] or 0,
-                        min_value=float(row[base_idx + 1]) if row[base_idx + 1] is not None else None,
-                        max_value=float(row[base_idx + 2]) if row[base_idx + 2] is not None else None,
-                        avg_value=float(row[base_idx + 3]) if row[base_idx + 3] is not None else None,
-                        sum_value=float(row[base_idx + 4]) if row[base_idx + 4] is not None else None
-                    ))
-                
-                return stats_list
+            result = conn.execute(query)
+            row = result.fetchone()
+            
+            if not row:
+                return []
+            
+            # Parse results into NumericColumnStats objects
+            stats_list = []
+            for idx, col_name in enumerate(columns_to_process):
+                # Results are in groups of 5: count, min, max, avg, sum
+                base_idx = idx * 5
+                stats_list.append(NumericColumnStats.model_construct(
+                    column_name=col_name,
+                    count=int((row[base_idx] or 0) * scale),
+                    min_value=float(row[base_idx + 1]) if row[base_idx + 1] is not None else None,
+                    max_value=float(row[base_idx + 2]) if row[base_idx + 2] is not None else None,
+                    avg_value=float(row[base_idx + 3]) if row[base_idx + 3] is not None else None,
+                    sum_value=float(row[base_idx + 4]) * scale if row[base_idx + 4] is not None else None
+                ))
+            
+            return stats_list
                 
         except Exception as e:
             logger.warning(f"Failed to get batched stats for {table_name}: {str(e)}")
@@ -315,7 +834,9 @@ class DatabaseVisualizationService:
         self,
         connection_id: str,
         include_statistics: bool = True,
-        max_tables: Optional[int] = None
+        max_tables: Optional[int] = None,
+        exact_counts: bool = False,
+        include_row_counts: bool = True
     ) -> DatabaseVisualizationResponse:
         """
         Extract comprehensive visualization metadata from connected database.
@@ -333,6 +854,8 @@ class DatabaseVisualizationService:
             connection_id: Active database connection ID
             include_statistics: Whether to compute statistics (may be slow for large DBs)
             max_tables: Limit number of tables to analyze (for performance)
+            exact_counts: Use COUNT(*) per table instead of catalog row estimates
+            include_row_counts: Skip row counting entirely when False (schema overview only)
             
         Returns:
             DatabaseVisualizationResponse with all metadata and suggested charts
@@ -351,12 +874,34 @@ class DatabaseVisualizationService:
                     error="Connection not found"
                 )
             
-            # Get inspector (cached, thread-safe for reads)
-            inspector = inspect(engine)
+            # Get inspector (cached per connection, thread-safe for reads)
+            inspector = self._get_inspector(connection_id, engine)
             database_type = engine.dialect.name
             
-            # Get all table names
-            table_names = inspector.get_table_names()
+            # Process tables in parallel using ThreadPoolExecutor
+            # This moves blocking DB I/O off the async event loop
+            loop = asyncio.get_event_loop()
+            
+            # Get all table names along with a fingerprint of the current schema
+            fingerprint, table_names = await loop.run_in_executor(
+                _executor, partial(self._get_schema_fingerprint, engine)
+            )
+            
+            # Serve repeated dashboard polls from cache while the schema is unchanged
+            cache_key = (
+                connection_id, include_statistics, max_tables, exact_counts, include_row_counts
+            )
+            cached = self._viz_cache.get(cache_key)
+            if cached:
+                cached_fingerprint, cached_response = cached
+                if cached_fingerprint == fingerprint:
+                    logger.info(f"Serving cached visualization metadata for {connection_id}")
+                    return cached_response
+            
+            # Rebuilding: drop the inspector's reflection results too. The fingerprint
+            # doesn't see column changes on every dialect (e.g. ALTER TABLE on MySQL or
+            # SQLite), so the inspector must not outlive the response cache's TTL
+            inspector.clear_cache()
             
             # Apply limit if specified
             if max_tables:
@@ -364,50 +909,45 @@ class DatabaseVisualizationService:
             
             logger.info(f"Processing {len(table_names)} tables in parallel...")
             
-            # Process tables in parallel using ThreadPoolExecutor
-            # This moves blocking DB I/O off the async event loop
-            loop = asyncio.get_event_loop()
-            
-            # Submit all table processing tasks to thread pool
-            futures = []
-            for table_name in table_names:
-                # Use partial to create callable with all arguments bound
-                task = partial(
-                    self._process_single_table,
-                    engine,
-                    table_name,
-                    inspector,
-                    include_statistics
-                )
-                # run_in_executor moves blocking work to thread pool
-                future = loop.run_in_executor(_executor, task)
-                futures.append(future)
-            
-            # Wait for all futures to complete
-            # This allows tables to be processed concurrently
-            results = await asyncio.gather(*futures, return_exceptions=True)
+            # Reflect columns/PKs/FKs for every table in three queries instead of 3 per table
+            reflections = await loop.run_in_executor(
+                _executor, partial(self._reflect_tables, inspector, table_names)
+            )
             
-            # Collect results
             tables_metadata: List[TableMetadata] = []
             statistics: List[TableStatistics] = []
-            total_rows = 0
+            total_rows = 0 if include_row_counts else None
             
-            for result in results:
-                if isinstance(result, Exception):
-                    logger.error(f"Table processing failed: {str(result)}")
-                    continue
-                
-                table_meta, table_stats, row_count = result
-                
+            # Consume results as each table finishes; only a bounded window of
+            # tables is in flight at any time
+            async for table_meta, table_stats, row_count in self._iter_table_results(
+                engine, table_names, reflections, include_statistics, exact_counts,
+                include_row_counts
+            ):
                 if table_meta:
                     tables_metadata.append(table_meta)
-                    total_rows += row_count
+                    if row_count is not None:
+                        total_rows += row_count
                 
                 if table_stats:
                     statistics.append(table_stats)
             
+            # Restore inspector ordering, since completion order is nondeterministic
+            table_order = {name: idx for idx, name in enumerate(table_names)}
+            tables_metadata.sort(key=lambda t: table_order[t.table_name])
+            statistics.sort(key=lambda t: table_order[t.table_name])
+            
             logger.info(f"Parallel processing complete: {len(tables_metadata)} tables processed")
             
+            # Remember table columns so custom visualizations can validate without inspection,
+            # and forget tables remembered as missing, since the schema may have changed
+            tables = self._schema_cache.setdefault(connection_id, {})
+            for name in [name for name, columns in tables.items() if columns is None]:
+                del tables[name]
+            tables.update(
+                (t.table_name, frozenset(c.name for c in t.columns)) for t in tables_metadata
+            )
+            
             # Generate suggested charts using rule-based logic
             suggested_charts = self._generate_suggested_charts(
                 tables_metadata, 
@@ -415,7 +955,7 @@ class DatabaseVisualizationService:
                 database_type
             )
             
-            return DatabaseVisualizationResponse(
+            response = DatabaseVisualizationResponse(
                 success=True,
                 connection_id=connection_id,
                 database_type=database_type,
@@ -425,6 +965,8 @@ class DatabaseVisualizationService:
                 total_tables=len(tables_metadata),
                 total_rows=total_rows
             )
+            self._viz_cache.set(cache_key, (fingerprint, response))
+            return response
             
         except Exception as e:
             logger.error(f"Failed to get visualization metadata: {str(e)}")
@@ -438,6 +980,67 @@ class DatabaseVisualizationService:
                 error=str(e)
             )
     
+    async def _iter_table_results(
+        self,
+        engine: Engine,
+        table_names: List[str],
+        reflections: Dict[str, Dict[str, Any]],
+        include_statistics: bool,
+        exact_counts: bool,
+        include_row_counts: bool = True
+    ) -> AsyncIterator[Tuple[Optional[TableMetadata], Optional[TableStatistics], Optional[int]]]:
+        """
+        Process tables on the thread pool and yield results in completion order.
+        
+        Keeps a sliding window of submitted tables (back-pressure) so memory for
+        pending futures stays constant regardless of schema size. The window never
+        exceeds the engine's pool size, since each table holds one connection.
+        
+        Args:
+            engine: SQLAlchemy engine
+            table_names: Tables to process
+            reflections: Pre-reflected metadata keyed by table name
+            include_statistics: Whether to compute numeric statistics
+            exact_counts: Use COUNT(*) instead of catalog row estimates
+            include_row_counts: Whether to look up row counts at all
+            
+        Yields:
+            Tuple of (TableMetadata, TableStatistics or None, row_count) per table
+        """
+        loop = asyncio.get_event_loop()
+        
+        window = _MAX_PENDING_TABLES
+        pool_size = self._get_pool_size(engine)
+        if pool_size:
+            window = min(window, pool_size)
+        
+        def submit(table_name: str) -> asyncio.Future:
+            # run_in_executor moves blocking work to thread pool
+            return loop.run_in_executor(_executor, partial(
+                self._process_single_table,
+                engine,
+                table_name,
+                reflections[table_name],
+                include_statistics,
+                exact_counts,
+                include_row_counts
+            ))
+        
+        remaining = iter(table_names)
+        pending = {submit(name) for name in islice(remaining, window)}
+        
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            
+            # Refill the window before handing results to the caller
+            pending.update(submit(name) for name in islice(remaining, len(done)))
+            
+            for future in done:
+                try:
+                    yield future.result()
+                except Exception as e:
+                    logger.error(f"Table processing failed: {str(e)}")
+    
     def _generate_suggested_charts(
         self,
         tables: List[TableMetadata],
@@ -459,22 +1062,45 @@ class DatabaseVisualizationService:
         Returns:
             List of ChartConfig objects with enhanced titles and descriptions
         """
+        # All chart inputs are server-generated, so charts skip Pydantic validation
         charts: List[ChartConfig] = []
         
+        # Row-count charts only cover tables whose rows were counted
+        counted_tables = [t for t in tables if t.row_count is not None]
+        
+        # Row counts as a flat int64 array: totals and top-N selection run in NumPy,
+        # and chart dicts are only built for the tables actually displayed
+        table_names = [t.table_name for t in counted_tables]
+        row_counts = np.fromiter(
+            (t.row_count for t in counted_tables), dtype=np.int64, count=len(counted_tables)
+        )
+        total_rows = int(row_counts.sum())
+        
+        # Select the largest tables once (partial sort) and reuse for the bar and pie
+        # charts so they share ordering
+        if len(counted_tables) > _MAX_CHART_BARS:
+            top_idx = np.sort(np.argpartition(row_counts, -_MAX_CHART_BARS)[-_MAX_CHART_BARS:])
+        else:
+            top_idx = np.arange(len(counted_tables))
+        top_idx = top_idx[np.argsort(-row_counts[top_idx], kind="stable")]
+        top_tables = list(zip(
+            [table_names[i] for i in top_idx.tolist()],
+            row_counts[top_idx].tolist()
+        ))
+        
         # Chart 1: Database Overview - Table Row Counts (Bar Chart)
         # Enhanced: Use database type in title, format description with total stats
-        if tables:
-            total_rows = sum(t.row_count for t in tables)
+        if top_tables:
             data = [
-                {"table": t.table_name, "rows": t.row_count}
-                for t in sorted(tables, key=lambda x: x.row_count, reverse=True)
+                {"table": name, "rows": rows}
+                for name, rows in top_tables
             ]
             
-            charts.append(ChartConfig(
+            charts.append(ChartConfig.model_construct(
                 chart_id="overview_row_counts",
                 chart_type="bar",
                 title=f"{database_type.upper()} Database: Records per Table",
-                description=f"Overview of {len(tables)} tables containing {total_rows:,} total records. Shows data distribution across your database schema.",
+                description=f"Overview of {len(counted_tables)} tables containing {total_rows:,} total records. Shows data distribution across your database schema.",
                 data=data,
                 x_axis="table",
                 y_axis="rows",
@@ -505,7 +1131,7 @@ class DatabaseVisualizationService:
                         readable_column = col_stat.column_name.replace('_', ' ').title()
                         readable_table = stat.table_name.replace('_', ' ').title()
                         
-                        charts.append(ChartConfig(
+                        charts.append(ChartConfig.model_construct(
                             chart_id=f"stats_{stat.table_name}_{col_stat.column_name}",
                             chart_type="bar",
                             title=f"{readable_table}: {readable_column} Analysis",
@@ -519,20 +1145,20 @@ class DatabaseVisualizationService:
         
         # Chart 3: Table Distribution (Pie Chart)
         # Enhanced: Only show if there's meaningful distribution, add percentage context
-        if len(tables) > 1:
-            total_rows = sum(t.row_count for t in tables)
+        if len(counted_tables) > 1:
             # Only create pie chart if there's meaningful distribution (not all zeros)
             data = [
-                {"table": t.table_name, "rows": t.row_count}
-                for t in tables if t.row_count > 0
+                {"table": name, "rows": rows}
+                for name, rows in top_tables if rows > 0
             ]
+            nonzero_tables = int(np.count_nonzero(row_counts > 0))
             
             if data and len(data) > 1:
-                charts.append(ChartConfig(
+                charts.append(ChartConfig.model_construct(
                     chart_id="table_distribution",
                     chart_type="pie",
                     title="Data Distribution Across Tables",
-                    description=f"Proportional view of {total_rows:,} total records distributed across {len(data)} tables. Larger slices indicate tables with more data.",
+                    description=f"Proportional view of {total_rows:,} total records distributed across {nonzero_tables} tables. Larger slices indicate tables with more data.",
                     data=data,
                     x_axis="table",
                     y_axis="rows",
@@ -542,6 +1168,35 @@ class DatabaseVisualizationService:
         
         return charts
     
+    def _validate_custom_columns(
+        self,
+        engine: Engine,
+        request: CustomVisualizationRequest
+    ) -> Optional[str]:
+        """
+        Check that the requested table and columns exist.
+        
+        Args:
+            engine: SQLAlchemy engine for the connection
+            request: CustomVisualizationRequest to validate
+            
+        Returns:
+            Error message, or None if the table and columns exist
+        """
+        column_names = self._get_cached_columns(
+            engine, request.connection_id, request.table_name
+        )
+        if column_names is None:
+            return f"Table '{request.table_name}' not found"
+        
+        if request.dimension_column and request.dimension_column not in column_names:
+            return f"Column '{request.dimension_column}' not found"
+        
+        if request.metric_column not in column_names:
+            return f"Column '{request.metric_column}' not found"
+        
+        return None
+    
     def generate_custom_visualization(
         self,
         request: CustomVisualizationRequest
@@ -565,68 +1220,60 @@ class DatabaseVisualizationService:
                     error="Connection not found"
                 )
             
-            inspector = inspect(engine)
-            
-            # Validate table exists
-            table_names = inspector.get_table_names()
-            if request.table_name not in table_names:
+            # Validate table and columns exist (served from cache when possible,
+            # so warm requests go straight to the query)
+            validation_error = self._validate_custom_columns(engine, request)
+            if validation_error:
                 return CustomVisualizationResponse(
                     success=False,
-                    error=f"Table '{request.table_name}' not found"
+                    error=validation_error
                 )
             
-            # Validate columns exist
-            columns_info = inspector.get_columns(request.table_name)
-            column_names = [col['name'] for col in columns_info]
-            
-            if request.dimension_column and request.dimension_column not in column_names:
+            # Validate aggregation function
+            valid_aggs = ['count', 'sum', 'avg', 'min', 'max']
+            if request.aggregation.lower() not in valid_aggs:
                 return CustomVisualizationResponse(
                     success=False,
-                    error=f"Column '{request.dimension_column}' not found"
+                    error=f"Invalid aggregation: {request.aggregation}"
                 )
             
-            if request.metric_column not in column_names:
+            # Validate sort order (it is part of the SQL text, not a bind parameter)
+            order = request.order_by.upper()
+            if order not in ('ASC', 'DESC'):
                 return CustomVisualizationResponse(
                     success=False,
-                    error=f"Column '{request.metric_column}' not found"
+                    error=f"Invalid sort order: {request.order_by}"
                 )
             
-            # Validate aggregation function
-            valid_aggs = ['count', 'sum', 'avg', 'min', 'max']
-            if request.aggregation.lower() not in valid_aggs:
-                return CustomVisualizationResponse(
-                    success=False,
-                    error=f"Invalid aggregation: {request.aggregation}"
-                )
+            # Build safe SQL query (cached per parameter combination)
+            query = _custom_viz_stmt(
+                engine.dialect,
+                request.table_name,
+                request.dimension_column,
+                request.metric_column,
+                request.aggregation.lower(),
+                order
+            )
             
-            # Build safe SQL query
-            agg_func = request.aggregation.upper()
-            
-            if request.dimension_column:
-                # Grouped query
-                query = text(f'''
-                    SELECT 
-                        "{request.dimension_column}" as dimension,
-                        {agg_func}("{request.metric_column}") as value
-                    FROM "{request.table_name}"
-                    WHERE "{request.dimension_column}" IS NOT NULL
-                    GROUP BY "{request.dimension_column}"
-                    ORDER BY value {request.order_by.upper()}
-                    LIMIT :limit
-                ''')
-            else:
-                # Single aggregate value
-                query = text(f'''
-                    SELECT 
-                        '{request.aggregation}' as dimension,
-                        {agg_func}("{request.metric_column}") as value
-                    FROM "{request.table_name}"
-                ''')
+            # Clamp the number of data points to avoid accidental full-result transfers
+            limit = min(max(request.limit, 1), _MAX_CUSTOM_VIZ_LIMIT)
             
             # Execute query
-            with engine.connect() as conn:
-                result = conn.execute(query, {"limit": request.limit} if request.dimension_column else {})
-                rows = result.fetchall()
+            try:
+                with engine.connect() as conn:
+                    result = conn.execute(query, {"limit": limit} if request.dimension_column else {})
+                    rows = result.fetchall()
+            except DBAPIError:
+                # The cached schema may be stale (table dropped, column renamed):
+                # refresh it and report a precise validation error if that is the cause
+                self._schema_cache.get(request.connection_id, {}).pop(request.table_name, None)
+                validation_error = self._validate_custom_columns(engine, request)
+                if validation_error:
+                    return CustomVisualizationResponse(
+                        success=False,
+                        error=validation_error
+                    )
+                raise
             
             # Convert to chart data
             data = [
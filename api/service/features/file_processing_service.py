@@ -1,19 +1,122 @@
-import io
-import markdown
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import chain
 from pathlib import Path
-from typing import Dict
+from typing import TYPE_CHECKING, BinaryIO, Dict, List, Tuple
 
-from bs4 import BeautifulSoup
-from docx import Document
 from fastapi import UploadFile, HTTPException, status
-from pypdf import PdfReader
 import logging
 
+# The parsing libraries are imported inside the extractor that needs them, so a
+# worker only pays the import cost for the formats it actually sees
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+    from lxml import etree
+
 import logging
 import re
 
 logger = logging.getLogger(__name__)
 
+# Plain-text URLs that may not be backed by a link annotation
+_URL_RE = re.compile(r'https?://[^\s<>"]+|www\.[^\s<>"]+')
+
+# PDFs with at least this many pages are split across worker processes. MuPDF
+# documents are not thread-safe, so each worker opens its own copy. Workers are
+# spawned rather than forked, since the server process runs threads (ONNX Runtime,
+# the embedding executor, MongoDB pool monitors) that a forked child can deadlock on
+_PDF_WORKERS = min(4, os.cpu_count() or 1)
+_PARALLEL_PDF_MIN_PAGES = 32
+_pdf_executor = ProcessPoolExecutor(
+    max_workers=_PDF_WORKERS, mp_context=multiprocessing.get_context("spawn")
+)
+
+# WordprocessingML names used when streaming word/document.xml
+_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_W_BODY = f"{{{_W_NS}}}body"
+_W_P = f"{{{_W_NS}}}p"
+_W_HYPERLINK = f"{{{_W_NS}}}hyperlink"
+_W_TYPE = f"{{{_W_NS}}}type"
+# Run children that stand for whitespace, as python-docx renders them in run text.
+# Page and column breaks (w:br with a w:type) add nothing
+_W_RUN_BREAKS = {
+    f"{{{_W_NS}}}tab": "\t",
+    f"{{{_W_NS}}}br": "\n",
+    f"{{{_W_NS}}}cr": "\n",
+}
+_RUN_CONTENT_XPATH = "./w:r/w:t/text() | ./w:r/w:tab | ./w:r/w:br | ./w:r/w:cr"
+_R_ID = f"{{{_R_NS}}}id"
+_PKG_RELATIONSHIP = f"{{{_PKG_REL_NS}}}Relationship"
+
+
+@lru_cache(maxsize=None)
+def _docx_xpaths() -> Tuple["etree.XPath", "etree.XPath"]:
+    """
+    Compile the DOCX paragraph XPath queries on first use.
+    
+    Returns:
+        Run content (text, tabs and breaks) and hyperlink elements of a paragraph
+        (in document order), and the run content of a single hyperlink
+    """
+    from lxml import etree
+    
+    namespaces = {"w": _W_NS}
+    return (
+        etree.XPath(f"{_RUN_CONTENT_XPATH} | ./w:hyperlink", namespaces=namespaces),
+        etree.XPath(_RUN_CONTENT_XPATH, namespaces=namespaces),
+    )
+
+
+def _run_content_text(part) -> str:
+    """Text for one run content item: run text as-is, tabs and line breaks as whitespace."""
+    if isinstance(part, str):
+        return part
+    if part.get(_W_TYPE) not in (None, "textWrapping"):
+        return ""
+    return _W_RUN_BREAKS[part.tag]
+
+
+def _extract_pdf_page(page) -> str:
+    """Extracts a single PDF page's text, appending any links found on it."""
+    text = page.get_text("text")
+    
+    # Extract URI links from annotations (MuPDF resolves the link actions for us),
+    # filtering out non-string links and deduplicating as we go
+    valid_links = set()
+    for link in page.get_links():
+        uri = link.get("uri")
+        if isinstance(uri, str):
+            valid_links.add(uri)
+    
+    # Regex fallback: Find links in plain text that might not have annotations.
+    # The substring probe skips the regex scan on pages without any URL text
+    if 'http' in text or 'www.' in text:
+        valid_links.update(_URL_RE.findall(text))
+    
+    # Append links to the bottom of the page text if found
+    if valid_links:
+        text += "\n\n**Links found on this page:**\n" + "".join(
+            f"- [{link}]({link})\n" for link in sorted(valid_links)
+        )
+    
+    return text
+
+
+def _extract_pdf_page_range(path: str, start: int, stop: int) -> List[str]:
+    """Worker entry point: extracts pages [start, stop) of the PDF at path."""
+    import pymupdf
+    
+    with pymupdf.open(path, filetype="pdf") as doc:
+        return [_extract_pdf_page(doc.load_page(i)) for i in range(start, stop)]
+
+
 class FileProcessingService:
     """A service dedicated to extracting text content from various file formats."""
 
@@ -22,21 +125,24 @@ class FileProcessingService:
         Extracts text content from an uploaded file based on its extension.
         Returns a dictionary containing the title and content.
         """
-        contents = await file.read()
+        # UploadFile is already backed by a SpooledTemporaryFile; read from it directly
+        # instead of buffering the whole upload into a bytes object first
+        await file.seek(0)
+        source = file.file
         filename = file.filename
         file_ext = Path(filename).suffix.lower()
 
         try:
             if file_ext == ".pdf":
-                text = self._extract_from_pdf(contents)
+                text = await self._extract_from_pdf(source)
             elif file_ext == ".docx":
-                text = self._extract_from_docx(contents)
+                text = self._extract_from_docx(source)
             elif file_ext == ".html":
-                text = self._extract_from_html(contents)
+                text = self._extract_from_html(source)
             elif file_ext == ".md":
-                text = self._extract_from_md(contents)
+                text = self._extract_from_md(source)
             elif file_ext == ".txt":
-                text = self._extract_from_txt(contents)
+                text = self._extract_from_txt(source)
             else:
                 raise HTTPException(
                     status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
@@ -55,105 +161,103 @@ class FileProcessingService:
                 detail=f"Failed to process file: {filename}. Error: {str(e)}",
             )
 
-    def _resolve_pdf_object(self, obj):
-        """Resolves indirect objects to their actual value."""
-        if hasattr(obj, "get_object"):
-            return obj.get_object()
-        return obj
-
-    def _extract_from_pdf(self, contents: bytes) -> str:
+    async def _extract_from_pdf(self, source: BinaryIO) -> str:
         """Extracts text from PDF file contents, including embedded links."""
-        with io.BytesIO(contents) as pdf_file:
-            reader = PdfReader(pdf_file)
-            full_text = []
-            
-            for page in reader.pages:
-                text = page.extract_text()
-                
-                # Extract links from annotations
-                links = []
-                if "/Annots" in page:
-                    for annot in page["/Annots"]:
-                        try:
-                            annot_obj = self._resolve_pdf_object(annot)
-                            
-                            # Ensure it's a Link annotation
-                            if annot_obj.get("/Subtype") == "/Link":
-                                # Check for Action (URL)
-                                if "/A" in annot_obj:
-                                    action = self._resolve_pdf_object(annot_obj["/A"])
-                                    if "/URI" in action:
-                                        links.append(action["/URI"])
-                        except Exception as e:
-                            logger.warning(f"Failed to process annotation: {e}")
-                            continue
-                
-                # Append links to the bottom of the page text if found
-                if links:
-                    # Filter out non-string links and deduplicate
-                    valid_links = {link for link in links if isinstance(link, str)}
-                    
-                    # Regex fallback: Find links in plain text that might not have annotations
-                    text_links = set(re.findall(r'https?://[^\s<>"]+|www\.[^\s<>"]+', text))
-                    valid_links.update(text_links)
-                    
-                    if valid_links:
-                        text += "\n\n**Links found on this page:**\n"
-                        for link in valid_links:
-                            text += f"- [{link}]({link})\n"
-                
-                full_text.append(text)
-                
-        return "\n".join(full_text)
+        import pymupdf
+        
+        contents = source.read()
+        with pymupdf.open(stream=contents, filetype="pdf") as doc:
+            page_count = doc.page_count
+            if _PDF_WORKERS == 1 or page_count < _PARALLEL_PDF_MIN_PAGES:
+                return "\n".join(_extract_pdf_page(page) for page in doc)
+        
+        # Large PDF: extract contiguous page ranges in parallel, keeping page order.
+        # Workers read the PDF from a temp file so the bytes aren't pickled to each one
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+            tmp.write(contents)
+        del contents
+        try:
+            step = -(-page_count // _PDF_WORKERS)
+            page_ranges = await asyncio.gather(*(
+                asyncio.wrap_future(
+                    _pdf_executor.submit(_extract_pdf_page_range, tmp.name, start, min(start + step, page_count))
+                )
+                for start in range(0, page_count, step)
+            ))
+        finally:
+            os.unlink(tmp.name)
+        return "\n".join(chain.from_iterable(page_ranges))
+
+    def shutdown(self) -> None:
+        """Stops the PDF worker processes; called on application shutdown."""
+        _pdf_executor.shutdown(wait=False, cancel_futures=True)
+
+    def _read_docx_hyperlinks(self, docx_zip: zipfile.ZipFile) -> Dict[str, str]:
+        """Maps relationship IDs to external hyperlink targets for the main document part."""
+        from lxml import etree
+        
+        try:
+            rels_xml = docx_zip.open("word/_rels/document.xml.rels")
+        except KeyError:
+            return {}
+
+        hyperlinks = {}
+        with rels_xml:
+            for _, rel in etree.iterparse(rels_xml, events=("end",), tag=_PKG_RELATIONSHIP):
+                if rel.get("TargetMode") == "External":
+                    hyperlinks[rel.get("Id")] = rel.get("Target")
+                rel.clear()
+        return hyperlinks
 
-    def _extract_from_docx(self, contents: bytes) -> str:
+    def _extract_from_docx(self, source: BinaryIO) -> str:
         """Extracts text from DOCX file contents, including embedded links."""
-        from docx import Document as DocxDocument
-        from docx.opc.constants import RELATIONSHIP_TYPE as RT
+        from lxml import etree
+        
+        para_parts_xpath, run_text_xpath = _docx_xpaths()
         
-        with io.BytesIO(contents) as docx_file:
-            doc = DocxDocument(docx_file)
+        with zipfile.ZipFile(source) as docx_zip:
+            hyperlinks = self._read_docx_hyperlinks(docx_zip)
             full_text = []
 
-            # 1. Iterate paragraphs to find text and hyperlinks
-            for para in doc.paragraphs:
-                para_text = ""
-                # We need to access the XML to find hyperlinks
-                # python-docx doesn't provide a direct way to iterate runs AND hyperlinks in order
-                # So we iterate the children of the paragraph element
-                for child in para._element:
-                    if child.tag.endswith('r'): # Run
-                        if child.text:
-                           para_text += child.text
-                    elif child.tag.endswith('hyperlink'): # Hyperlink
-                         # Extract relationship ID
-                        r_id = child.get('{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id')
-                        if r_id:
-                            try:
-                                rel = doc.part.rels[r_id]
-                                if rel.target_mode == 'External':
-                                    url = rel.target_ref
-                                    # Extract display text from the hyperlink tag's children runs
-                                    display_text = ""
-                                    for subchild in child:
-                                        if subchild.tag.endswith('r'):
-                                            if subchild.text:
-                                                display_text += subchild.text
-                                    
-                                    # Format as Markdown link
-                                    para_text += f" [{display_text}]({url}) "
-                            except Exception:
-                                pass # Skip if relationship not found
-                
-                if para_text.strip():
-                    full_text.append(para_text)
+            # Stream body paragraphs out of document.xml instead of building the whole
+            # python-docx object model, freeing each subtree once it has been read
+            with docx_zip.open("word/document.xml") as document_xml:
+                for _, para in etree.iterparse(document_xml, events=("end",), tag=_W_P):
+                    parent = para.getparent()
+                    if parent is None or parent.tag != _W_BODY:
+                        # Table cell / text box paragraph; released with its body-level ancestor
+                        continue
+
+                    parts = []
+                    for part in para_parts_xpath(para):
+                        if isinstance(part, str) or part.tag != _W_HYPERLINK:  # Run content
+                            parts.append(_run_content_text(part))
+                            continue
+                        url = hyperlinks.get(part.get(_R_ID))
+                        if url:
+                            # Extract display text from the hyperlink tag's children runs
+                            display_text = "".join(map(_run_content_text, run_text_xpath(part)))
+                            # Format as Markdown link
+                            parts.append(f" [{display_text}]({url}) ")
+                    para_text = "".join(parts)
+
+                    if para_text.strip():
+                        full_text.append(para_text)
+
+                    para.clear()
+                    while para.getprevious() is not None:
+                        del parent[0]
                     
         return "\n".join(full_text)
 
-    def _extract_from_html(self, contents: bytes) -> str:
+    def _extract_from_html(self, source: BinaryIO) -> str:
         """Extracts text from HTML file contents, preserving links as Markdown."""
-        soup = BeautifulSoup(contents, "html.parser")
+        from bs4 import BeautifulSoup
         
+        return self._html_to_markdown_text(BeautifulSoup(source, "lxml"))
+
+    def _html_to_markdown_text(self, soup: "BeautifulSoup") -> str:
+        """Flattens a parsed HTML document to text, rewriting anchors as Markdown links."""
         # Convert tags to Markdown links: [text](href)
         for a in soup.find_all('a', href=True):
             markdown_link = f"[{a.get_text(strip=True)}]({a['href']})"
@@ -161,14 +265,18 @@ class FileProcessingService:
             
         return soup.get_text(separator="\n", strip=True)
 
-    def _extract_from_md(self, contents: bytes) -> str:
+    def _extract_from_md(self, source: BinaryIO) -> str:
         """Extracts text from Markdown file contents by converting to HTML first."""
-        html = markdown.markdown(contents.decode("utf-8"))
-        return self._extract_from_html(html.encode("utf-8"))
+        import markdown
+        from bs4 import BeautifulSoup
+        
+        html = markdown.markdown(source.read().decode("utf-8"))
+        # Parse the rendered str directly rather than re-encoding it for _extract_from_html
+        return self._html_to_markdown_text(BeautifulSoup(html, "lxml"))
 
-    def _extract_from_txt(self, contents: bytes) -> str:
+    def _extract_from_txt(self, source: BinaryIO) -> str:
         """Extracts text from a plain text file."""
-        return contents.decode("utf-8")
+        return source.read().decode("utf-8")
 
 
 # Singleton instance
@@ -3,75 +3,110 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
 from reportlab.lib.enums import TA_LEFT, TA_JUSTIFY
-from io import BytesIO
 from datetime import datetime
-from typing import List, Dict, Any
+from tempfile import SpooledTemporaryFile
+from typing import IO, List, Dict, Any, Optional
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
-class PDFExportService:
-    def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self._setup_custom_styles()
+# Exported PDFs are kept in memory up to this size, then spill to a temporary file
+_SPOOL_MAX_BYTES = 4 * 1024 * 1024
+
+# Vertical gaps between story sections. A fresh Spacer is created per use because
+# reportlab marks a flowable as postponed when it lands on a page break, so shared
+# instances would carry that state into later exports
+_GAP_SMALL = 0.1 * inch
+_GAP_SOURCE = 0.15 * inch
+_GAP_MEDIUM = 0.2 * inch
+_GAP_LARGE = 0.3 * inch
+
+# Anything outside printable ASCII (emojis, special unicode characters)
+_NON_ASCII_RE = re.compile(r'[^\x00-\x7F]+')
+_WS_RE = re.compile(r'\s+')
+# HTML special characters that must be escaped for reportlab's paragraph markup
+_HTML_ESCAPE = str.maketrans({
+    '&': '&amp;',
+    '<': '&lt;',
+    '>': '&gt;',
+})
+
+
+def _build_styles():
+    """Build the sample stylesheet plus the custom paragraph styles used in exported PDFs"""
+    styles = getSampleStyleSheet()
+
+    # Custom style for title
+    styles.add(ParagraphStyle(
+        name='CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        textColor='#1f2937',
+        spaceAfter=12,
+        leftIndent=0
+    ))
     
-    def _setup_custom_styles(self):
-        """Setup custom paragraph styles for the PDF"""
-        # Custom style for title
-        self.styles.add(ParagraphStyle(
-            name='CustomTitle',
-            parent=self.styles['Heading1'],
-            fontSize=18,
-            textColor='#1f2937',
-            spaceAfter=12,
-            leftIndent=0
-        ))
-        
-        # Custom style for query
-        self.styles.add(ParagraphStyle(
-            name='Query',
-            parent=self.styles['Normal'],
-            fontSize=11,
-            textColor='#374151',
-            spaceAfter=8,
-            leftIndent=10,
-            rightIndent=10,
-            backColor='#f3f4f6',
-            borderPadding=8
-        ))
-        
-        # Custom style for answer
-        self.styles.add(ParagraphStyle(
-            name='Answer',
-            parent=self.styles['Normal'],
-            fontSize=10,
-            textColor='#1f2937',
-            spaceAfter=12,
-            alignment=TA_JUSTIFY,
-            leading=14
-        ))
-        
-        # Custom style for sources header
-        self.styles.add(ParagraphStyle(
-            name='SourcesHeader',
-            parent=self.styles['Heading2'],
-            fontSize=12,
-            textColor='#4b5563',
-            spaceAfter=8
-        ))
-        
-        # Custom style for source content
-        self.styles.add(ParagraphStyle(
-            name='SourceContent',
-            parent=self.styles['Normal'],
-            fontSize=9,
-            textColor='#6b7280',
-            spaceAfter=6,
-            leftIndent=15,
-            leading=12
-        ))
+    # Custom style for query
+    styles.add(ParagraphStyle(
+        name='Query',
+        parent=styles['Normal'],
+        fontSize=11,
+        textColor='#374151',
+        spaceAfter=8,
+        leftIndent=10,
+        rightIndent=10,
+        backColor='#f3f4f6',
+        borderPadding=8
+    ))
+    
+    # Custom style for answer
+    styles.add(ParagraphStyle(
+        name='Answer',
+        parent=styles['Normal'],
+        fontSize=10,
+        textColor='#1f2937',
+        spaceAfter=12,
+        alignment=TA_JUSTIFY,
+        leading=14
+    ))
+    
+    # Custom style for sources header
+    styles.add(ParagraphStyle(
+        name='SourcesHeader',
+        parent=styles['Heading2'],
+        fontSize=12,
+        textColor='#4b5563',
+        spaceAfter=8
+    ))
     
-    def generate_chat_pdf(self, query: str, answer: str, sources: List[Dict[str, Any]], username: str) -> BytesIO:
+    # Custom style for source content
+    styles.add(ParagraphStyle(
+        name='SourceContent',
+        parent=styles['Normal'],
+        fontSize=9,
+        textColor='#6b7280',
+        spaceAfter=6,
+        leftIndent=15,
+        leading=12
+    ))
+
+    return styles
+
+
+# Built once at import; ParagraphStyle objects are read-only during story building
+_STYLES = _build_styles()
+
+
+class PDFExportService:
+    def generate_chat_pdf(
+        self,
+        query: str,
+        answer: str,
+        sources: List[Dict[str, Any]],
+        username: str,
+        out: Optional[IO[bytes]] = None
+    ) -> IO[bytes]:
         """
         Generate a PDF document containing the query, answer, and sources.
         
@@ -80,14 +115,17 @@ class PDFExportService:
             answer: The AI-generated answer
             sources: List of source documents
             username: Username of the person who made the query
+            out: Writable binary stream to build the PDF into. Defaults to a
+                SpooledTemporaryFile that stays in memory for small documents
             
         Returns:
-            BytesIO: PDF file as bytes
+            IO[bytes]: The stream the PDF was written to, rewound to the start
         """
         try:
-            buffer = BytesIO()
+            if out is None:
+                out = SpooledTemporaryFile(max_size=_SPOOL_MAX_BYTES)
             doc = SimpleDocTemplate(
-                buffer,
+                out,
                 pagesize=letter,
                 rightMargin=72,
                 leftMargin=72,
@@ -95,92 +133,88 @@ class PDFExportService:
                 bottomMargin=18
             )
             
-            story = []
+            # Resolve styles once rather than per Paragraph
+            normal_style = _STYLES['Normal']
+            heading_style = _STYLES['Heading2']
+            answer_style = _STYLES['Answer']
+            source_content_style = _STYLES['SourceContent']
             
-            # Title
-            title = Paragraph("RAG Query Response", self.styles['CustomTitle'])
-            story.append(title)
-            story.append(Spacer(1, 0.2 * inch))
-            
-            # Metadata
             timestamp = datetime.now().strftime("%B %d, %Y at %I:%M %p")
-            metadata = Paragraph(
-                f"<b>User:</b> {username}<br/><b>Date:</b> {timestamp}",
-                self.styles['Normal']
-            )
-            story.append(metadata)
-            story.append(Spacer(1, 0.3 * inch))
-            
-            # Query section
-            query_header = Paragraph("<b>Question:</b>", self.styles['Heading2'])
-            story.append(query_header)
-            story.append(Spacer(1, 0.1 * inch))
             
-            query_text = Paragraph(self._escape_html(query), self.styles['Query'])
-            story.append(query_text)
-            story.append(Spacer(1, 0.3 * inch))
-            
-            # Answer section
-            answer_header = Paragraph("<b>Answer:</b>", self.styles['Heading2'])
-            story.append(answer_header)
-            story.append(Spacer(1, 0.1 * inch))
+            story = [
+                # Title
+                Paragraph("RAG Query Response", _STYLES['CustomTitle']),
+                Spacer(1, _GAP_MEDIUM),
+                
+                # Metadata
+                Paragraph(
+                    f"<b>User:</b> {username}<br/><b>Date:</b> {timestamp}",
+                    normal_style
+                ),
+                Spacer(1, _GAP_LARGE),
+                
+                # Query section
+                Paragraph("<b>Question:</b>", heading_style),
+                Spacer(1, _GAP_SMALL),
+                Paragraph(self._escape_html(query), _STYLES['Query']),
+                Spacer(1, _GAP_LARGE),
+                
+                # Answer section
+                Paragraph("<b>Answer:</b>", heading_style),
+                Spacer(1, _GAP_SMALL),
+            ]
             
             # Split answer into paragraphs for better formatting
-            answer_paragraphs = answer.split('\n\n')
-            for para in answer_paragraphs:
-                if para.strip():
-                    answer_para = Paragraph(self._escape_html(para.strip()), self.styles['Answer'])
-                    story.append(answer_para)
-                    story.append(Spacer(1, 0.1 * inch))
+            escape_html = self._escape_html
+            story.extend([
+                item
+                for para in answer.split('\n\n') if para.strip()
+                for item in (Paragraph(escape_html(para.strip()), answer_style), Spacer(1, _GAP_SMALL))
+            ])
             
             # Sources section
-            if sources and len(sources) > 0:
-                story.append(Spacer(1, 0.2 * inch))
-                sources_header = Paragraph(
-                    f"<b>Sources ({len(sources)} document{'' if len(sources) == 1 else 's'}):</b>",
-                    self.styles['SourcesHeader']
-                )
-                story.append(sources_header)
-                story.append(Spacer(1, 0.1 * inch))
+            if sources:
+                story.extend([
+                    Spacer(1, _GAP_MEDIUM),
+                    Paragraph(
+                        f"<b>Sources ({len(sources)} document{'' if len(sources) == 1 else 's'}):</b>",
+                        _STYLES['SourcesHeader']
+                    ),
+                    Spacer(1, _GAP_SMALL),
+                ])
                 
+                source_items = []
                 for idx, source in enumerate(sources, 1):
-                    # Source number and title
-                    source_title = source.get('title', 'Untitled')
-                    source_header = Paragraph(
-                        f"<b>Source {idx}: {self._escape_html(source_title)}</b>",
-                        self.styles['Normal']
-                    )
-                    story.append(source_header)
-                    
                     # Source content - clean and truncate intelligently
-                    content = source.get('content', '')
-                    content = self._clean_text(content)  # Clean first
+                    content = self._clean_text(source.get('content', ''))  # Clean first
                     
                     # Truncate at sentence boundary if too long
                     if len(content) > 800:
                         content = self._truncate_at_sentence(content, 800)
                     
-                    source_content = Paragraph(
-                        self._escape_html(content),
-                        self.styles['SourceContent']
+                    # Source number and title, then its content
+                    source_items += (
+                        Paragraph(
+                            f"<b>Source {idx}: {escape_html(source.get('title', 'Untitled'))}</b>",
+                            normal_style
+                        ),
+                        Paragraph(escape_html(content), source_content_style),
+                        Spacer(1, _GAP_SOURCE),
                     )
-                    story.append(source_content)
-                    story.append(Spacer(1, 0.15 * inch))
+                story.extend(source_items)
             
             # Footer
-            story.append(Spacer(1, 0.3 * inch))
-            footer = Paragraph(
-                "<i>Generated by Modular RAG System</i>",
-                self.styles['Normal']
-            )
-            story.append(footer)
+            story.extend([
+                Spacer(1, _GAP_LARGE),
+                Paragraph("<i>Generated by Modular RAG System</i>", normal_style),
+            ])
             
             # Build PDF
             doc.build(story)
-            buffer.seek(0)
+            out.seek(0)
             
             logger.info(f"Generated PDF for user '{username}' with query: '{query[:50]}...'")
-            return buffer
+            return out
             
         except Exception as e:
             logger.error(f"Error generating PDF: {e}")
@@ -196,56 +230,38 @@ class PDFExportService:
         # First, clean the text from unwanted characters and emojis
         text = self._clean_text(text)
         
-        # Then escape HTML special characters
-        replacements = {
-            '&': '&amp;',
-            '<': '&lt;',
-            '>': '&gt;',
-        }
-        
-        for old, new in replacements.items():
-            text = text.replace(old, new)
-        
-        return text
+        # Then escape HTML special characters in a single pass
+        return text.translate(_HTML_ESCAPE)
     
     def _clean_text(self, text: str) -> str:
         """Clean text from emojis, special unicode characters, and extra whitespace"""
         if not text:
             return ""
         
-        import re
-        
-        # Remove emojis and special unicode characters (keep only printable ASCII and basic punctuation)
-        # This regex keeps letters, numbers, basic punctuation, and whitespace
-        text = re.sub(r'[^\x00-\x7F]+', ' ', text)
+        # Fast path for the common all-ASCII case: str.split() collapses whitespace the
+        # same way as \s+ without running either regex
+        if text.isascii():
+            return ' '.join(text.split())
         
-        # Remove multiple spaces
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Remove leading/trailing whitespace
-        text = text.strip()
-        
-        return text
+        # Replace emojis and special unicode characters with a space, then collapse
+        # runs of whitespace and strip the ends
+        return _WS_RE.sub(' ', _NON_ASCII_RE.sub(' ', text)).strip()
     
     def _truncate_at_sentence(self, text: str, max_length: int) -> str:
         """Truncate text at the nearest sentence boundary before max_length"""
         if not text or len(text) <= max_length:
             return text
         
-        import re
-        
         # Truncate to max_length first
         truncated = text[:max_length]
         
-        # Find the last sentence-ending punctuation (., !, ?)
-        # Look for these followed by space or end of string
-        sentence_endings = re.finditer(r'[.!?]\s', truncated)
-        last_ending = None
-        
-        for match in sentence_endings:
-            last_ending = match.end()
+        # Find the last sentence-ending punctuation (., !, ?) followed by a space.
+        # Callers pass text through _clean_text first, so whitespace is already single spaces
+        last_ending = max(truncated.rfind('. '), truncated.rfind('! '), truncated.rfind('? '))
+        if last_ending >= 0:
+            last_ending += 2
         
-        if last_ending and last_ending > max_length * 0.5:  # At least 50% of max_length
+        if last_ending > max_length * 0.5:  # At least 50% of max_length
             return truncated[:last_ending].strip() + "..."
         
         # If no good sentence boundary found, truncate at last space
@@ -1,26 +1,140 @@
-from typing import Optional
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+import hashlib
 import logging
 import re
+import time
+import sqlglot
+from sqlglot import exp
+from sqlglot.dialects.dialect import Dialect
+from sqlglot.errors import SqlglotError
 from service.rag.gemini_service import gemini_service
 
 logger = logging.getLogger(__name__)
 
+# Generated SQL depends only on the schema and question, both part of the prompt,
+# so identical prompts can be answered from the Gemini response cache for a day
+_SQL_RESPONSE_CACHE_TTL_SECONDS = 86400
+
+# The instructions + schema prefix is uploaded once as a Gemini context cache and
+# referenced by name for this long. Handles are retired a minute early so a request
+# never points at a cache that expires in flight
+_SCHEMA_CONTEXT_CACHE_TTL_SECONDS = 3600
+_SCHEMA_CONTEXT_CACHE_MARGIN_SECONDS = 60
+
+# SQL lexer used by the minifier: quoted literals/identifiers (with doubled-quote
+# escapes, possibly unterminated), comments, whitespace runs, and everything else
+_SQL_TOKEN_RE = re.compile(
+    r"'[^']*(?:''[^']*)*'?"
+    r'|"[^"]*(?:""[^"]*)*"?'
+    r'|`[^`]*`?'
+    r'|--[^\n]*'
+    r'|/\*.*?(?:\*/|\Z)'
+    r'|\s+'
+    r'|\w+'
+    r'|[^\'"`\s/\w-]+'
+    r'|.',
+    re.DOTALL
+)
+
+# Characters an LLM may wrap the whole query in
+_WRAP_CHARS = frozenset('"\'`')
+
+# First line of a multi-line response that starts with SELECT (leading blanks allowed)
+_SELECT_LINE_RE = re.compile(r'^[^\S\n]*(select[^\n]*)', re.IGNORECASE | re.MULTILINE)
+
+# AST nodes that write or change the database, or that sqlglot could only parse as an
+# opaque command (EXEC, CALL, ...); any of them anywhere in the tree rejects the query.
+# exp.Into covers SELECT ... INTO, which creates a table
+_FORBIDDEN_NODES = (
+    exp.Drop, exp.Delete, exp.Insert, exp.Update, exp.Alter, exp.Create,
+    exp.TruncateTable, exp.Merge, exp.Grant, exp.Revoke, exp.Command, exp.Into
+)
+
+# SQLAlchemy dialect names that differ from sqlglot's
+_SQLGLOT_DIALECTS = {"postgresql": "postgres", "mssql": "tsql"}
+
+
+def _to_sqlglot_dialect(database_type: Optional[str]) -> Optional[str]:
+    """Map a SQLAlchemy dialect name to a sqlglot dialect, or None for the generic one"""
+    if not database_type:
+        return None
+    dialect = _SQLGLOT_DIALECTS.get(database_type, database_type)
+    return dialect if Dialect.get(dialect) is not None else None
+
+# Fixed part of the SQL generation prompt. Keep this text stable: any edit changes
+# the cached prefix for every request
+_STATIC_PROMPT_PREFIX = """You are an expert SQL query generator. Generate a COMPLETE, VALID, SYNTACTICALLY CORRECT SQL SELECT query.
+
+CRITICAL REQUIREMENTS:
+1. Generate ONLY a SELECT query (no INSERT, UPDATE, DELETE, DROP, etc.)
+2. Use EXACT table and column names from the database schema below
+3. ALL string literals MUST be enclosed in MATCHING single quotes (e.g., 'value')
+4. Ensure ALL quotes are properly closed - count your quotes!
+5. The query MUST have a FROM clause - this is MANDATORY
+6. Use proper SQL syntax - no syntax errors allowed
+7. For questions about relationships between tables, use JOINs based on foreign keys
+8. Use GROUP BY with aggregate functions (COUNT, SUM, AVG, MAX, MIN) when counting or aggregating
+9. Add WHERE clauses for filtering when needed
+10. Add ORDER BY clauses when sorting is implied
+11. Use LIMIT when the question asks for "top N" or similar
+12. Return ONLY the SQL query on a SINGLE LINE - no explanations, no markdown, no code blocks
+13. Do not wrap the query in quotes or backticks
+
+EXAMPLES OF CORRECT QUERIES:
+
+Simple queries:
+- SELECT * FROM customers WHERE city = 'New York'
+- SELECT name, email FROM customers WHERE created_at > '2024-01-01'
+- SELECT COUNT(*) FROM orders WHERE status = 'Delivered'
+
+Queries with JOINs:
+- SELECT customers.name, COUNT(orders.order_id) FROM customers JOIN orders ON customers.customer_id = orders.customer_id GROUP BY customers.customer_id, customers.name
+- SELECT products.product_name, SUM(order_items.quantity) FROM products JOIN order_items ON products.product_id = order_items.product_id GROUP BY products.product_id, products.product_name
+- SELECT customers.name, orders.order_date, orders.total_amount FROM customers JOIN orders ON customers.customer_id = orders.customer_id WHERE orders.status = 'Delivered'
+
+Queries with aggregations:
+- SELECT customer_id, COUNT(*) as order_count FROM orders GROUP BY customer_id ORDER BY order_count DESC
+- SELECT category, AVG(price) as avg_price FROM products GROUP BY category
+- SELECT status, COUNT(*) as count FROM orders GROUP BY status
+
+Complex queries:
+- SELECT c.name, COUNT(DISTINCT o.order_id) as total_orders, SUM(o.total_amount) as total_spent FROM customers c LEFT JOIN orders o ON c.customer_id = o.customer_id GROUP BY c.customer_id, c.name ORDER BY total_spent DESC LIMIT 10
+
+IMPORTANT: Your response must be ONLY the SQL query, nothing else. Write it on a single line.
+
+DATABASE SCHEMA:
+"""
+_QUESTION_SEPARATOR = "\n\nUSER QUESTION: "
+_PROMPT_SUFFIX = "\n\nGenerate the SQL query now:"
+
+
+@lru_cache(maxsize=64)
+def _build_static_part(schema: str) -> str:
+    """
+    Render the schema-specific prompt prefix (fixed instructions + schema + question
+    label), so repeated questions against the same schema only append their tail.
+    
+    Entries are keyed by the formatted schema text itself, so a changed schema gets a
+    new entry; call _build_static_part.cache_clear() to drop old ones eagerly (e.g.
+    after a schema migration or on disconnect).
+    """
+    return f"{_STATIC_PROMPT_PREFIX}{schema}{_QUESTION_SEPARATOR}"
+
 
 class SQLGenerationService:
     """Service for generating SQL queries from natural language using Gemini LLM"""
     
     def __init__(self):
-        self.dangerous_keywords = [
-            "DROP", "DELETE", "INSERT", "UPDATE", "ALTER", 
-            "CREATE", "TRUNCATE", "GRANT", "REVOKE", "EXEC",
-            "EXECUTE", "MERGE", "REPLACE"
-        ]
+        # (model, schema hash) -> (context cache name, or None if caching failed; expiry)
+        self._schema_handles: Dict[Tuple[str, str], Tuple[Optional[str], float]] = {}
     
     async def generate_sql(
         self, 
         natural_language_query: str, 
         formatted_schema: str,
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        database_type: Optional[str] = None
     ) -> str:
         """
         Generate SQL query from natural language using Gemini LLM
@@ -29,6 +143,8 @@ class SQLGenerationService:
             natural_language_query: User's question in natural language
             formatted_schema: Database schema formatted for LLM understanding
             model: Optional model name to use
+            database_type: SQLAlchemy dialect name of the target database, used to
+                parse the generated query
             
         Returns:
             Generated SQL query string
@@ -37,21 +153,31 @@ class SQLGenerationService:
             Exception: If SQL generation fails or validation fails
         """
         try:
-            # Create structured prompt for SQL generation
-            prompt = self._create_sql_generation_prompt(
-                natural_language_query, 
-                formatted_schema
-            )
+            # Reference the schema through a context cache when one is available, so only
+            # the question is sent; otherwise inline the full structured prompt
+            schema_handle = await self._get_schema_handle(formatted_schema, model)
+            if schema_handle:
+                prompt = natural_language_query + _PROMPT_SUFFIX
+            else:
+                prompt = self._create_sql_generation_prompt(
+                    natural_language_query, 
+                    formatted_schema
+                )
             
             # Generate SQL using Gemini
             logger.info(f"Generating SQL for query: {natural_language_query} using model: {model}")
-            response = await gemini_service.generate_answer(prompt, model=model)
+            response = await gemini_service.generate_answer(
+                prompt,
+                model=model,
+                cache_ttl=_SQL_RESPONSE_CACHE_TTL_SECONDS,
+                cached_content=schema_handle
+            )
             
             # Extract clean SQL from response
-            sql_query = self._extract_sql_from_response(response)
+            sql_query = self._minify_sql(self._extract_sql_from_response(response))
             
             # Validate the generated SQL
-            self._validate_sql(sql_query)
+            self._validate_sql(sql_query, database_type)
             
             logger.info(f"Generated SQL: {sql_query}")
             return sql_query
@@ -60,59 +186,46 @@ class SQLGenerationService:
             logger.error(f"SQL generation failed: {str(e)}")
             raise Exception(f"Failed to generate SQL: {str(e)}")
     
+    async def _get_schema_handle(self, schema: str, model: Optional[str]) -> Optional[str]:
+        """
+        Return the Gemini context cache holding the instructions + schema prefix,
+        creating it on first use for this schema and model.
+        
+        A failed creation (e.g. the prefix is below the model's minimum cacheable size)
+        is remembered for the same TTL so later calls go straight to the inline prompt.
+        A changed schema hashes to a new key and gets a new cache.
+        """
+        key = (model or "", hashlib.sha256(schema.encode("utf-8")).hexdigest())
+        now = time.monotonic()
+        entry = self._schema_handles.get(key)
+        if entry is not None and now < entry[1]:
+            return entry[0]
+        
+        handle = await gemini_service.create_context_cache(
+            _build_static_part(schema),
+            model=model,
+            ttl_seconds=_SCHEMA_CONTEXT_CACHE_TTL_SECONDS
+        )
+        self._schema_handles = {k: v for k, v in self._schema_handles.items() if now < v[1]}
+        self._schema_handles[key] = (
+            handle,
+            now + _SCHEMA_CONTEXT_CACHE_TTL_SECONDS - _SCHEMA_CONTEXT_CACHE_MARGIN_SECONDS
+        )
+        return handle
+    
     def _create_sql_generation_prompt(
         self, 
         user_query: str, 
         schema: str
     ) -> str:
-        """Create a structured prompt for SQL generation"""
-        prompt = f"""You are an expert SQL query generator. Generate a COMPLETE, VALID, SYNTACTICALLY CORRECT SQL SELECT query.
-
-DATABASE SCHEMA:
-{schema}
-
-USER QUESTION: {user_query}
-
-CRITICAL REQUIREMENTS:
-1. Generate ONLY a SELECT query (no INSERT, UPDATE, DELETE, DROP, etc.)
-2. Use EXACT table and column names from the schema above
-3. ALL string literals MUST be enclosed in MATCHING single quotes (e.g., 'value')
-4. Ensure ALL quotes are properly closed - count your quotes!
-5. The query MUST have a FROM clause - this is MANDATORY
-6. Use proper SQL syntax - no syntax errors allowed
-7. For questions about relationships between tables, use JOINs based on foreign keys
-8. Use GROUP BY with aggregate functions (COUNT, SUM, AVG, MAX, MIN) when counting or aggregating
-9. Add WHERE clauses for filtering when needed
-10. Add ORDER BY clauses when sorting is implied
-11. Use LIMIT when the question asks for "top N" or similar
-12. Return ONLY the SQL query on a SINGLE LINE - no explanations, no markdown, no code blocks
-13. Do not wrap the query in quotes or backticks
-
-EXAMPLES OF CORRECT QUERIES:
-
-Simple queries:
-- SELECT * FROM customers WHERE city = 'New York'
-- SELECT name, email FROM customers WHERE created_at > '2024-01-01'
-- SELECT COUNT(*) FROM orders WHERE status = 'Delivered'
-
-Queries with JOINs:
-- SELECT customers.name, COUNT(orders.order_id) FROM customers JOIN orders ON customers.customer_id = orders.customer_id GROUP BY customers.customer_id, customers.name
-- SELECT products.product_name, SUM(order_items.quantity) FROM products JOIN order_items ON products.product_id = order_items.product_id GROUP BY products.product_id, products.product_name
-- SELECT customers.name, orders.order_date, orders.total_amount FROM customers JOIN orders ON customers.customer_id = orders.customer_id WHERE orders.status = 'Delivered'
-
-Queries with aggregations:
-- SELECT customer_id, COUNT(*) as order_count FROM orders GROUP BY customer_id ORDER BY order_count DESC
-- SELECT category, AVG(price) as avg_price FROM products GROUP BY category
-- SELECT status, COUNT(*) as count FROM orders GROUP BY status
-
-Complex queries:
-- SELECT c.name, COUNT(DISTINCT o.order_id) as total_orders, SUM(o.total_amount) as total_spent FROM customers c LEFT JOIN orders o ON c.customer_id = o.customer_id GROUP BY c.customer_id, c.name ORDER BY total_spent DESC LIMIT 10
-
-IMPORTANT: Your response must be ONLY the SQL query, nothing else. Write it on a single line.
-
-Generate the SQL query now:"""
+        """
+        Create a structured prompt for SQL generation
         
-        return prompt
+        The fixed instructions and examples come first and are byte-identical on
+        every call, so Gemini's implicit prefix caching can reuse them; the
+        per-request schema and question follow.
+        """
+        return _build_static_part(schema) + user_query + _PROMPT_SUFFIX
     
     def _extract_sql_from_response(self, response: str) -> str:
         """
@@ -125,31 +238,28 @@ Generate the SQL query now:"""
         sql = response.strip()
         
         # Remove ```sql or ``` markers
-        sql = re.sub(r'^```sql\s*', '', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'^```\s*', '', sql)
-        sql = re.sub(r'\s*```$', '', sql)
-        
-        # Remove ONLY wrapping quotes/backticks (not quotes within the SQL)
-        # Check if the entire string is wrapped in quotes
-        if len(sql) >= 2:
-            # Check for matching wrapping quotes
-            if (sql[0] == '"' and sql[-1] == '"') or \
-               (sql[0] == "'" and sql[-1] == "'") or \
-               (sql[0] == '`' and sql[-1] == '`'):
-                sql = sql[1:-1]
-                logger.info("Removed wrapping quotes")
-        
-        # If there are multiple lines, try to find the SELECT statement
-        lines = sql.split('\n')
-        if len(lines) > 1:
-            logger.info(f"Multi-line response, {len(lines)} lines found")
-            for line in lines:
-                line = line.strip()
-                if line.upper().startswith('SELECT'):
-                    # Take this line as the SQL
-                    sql = line
-                    logger.info(f"Extracted SELECT line: {sql[:100]}...")
-                    break
+        if sql[:6].lower() == '```sql':
+            sql = sql[6:].lstrip()
+        if sql.startswith('```'):
+            sql = sql[3:].lstrip()
+        if sql.endswith('```'):
+            sql = sql[:-3].rstrip()
+        
+        # Remove ONLY wrapping quotes/backticks (not quotes within the SQL):
+        # the same quote character must open and close the entire string
+        if len(sql) >= 2 and sql[0] == sql[-1] and sql[0] in _WRAP_CHARS:
+            sql = sql[1:-1]
+            logger.info("Removed wrapping quotes")
+        
+        # If there are multiple lines, try to find the SELECT statement in one scan
+        # instead of splitting into lines and upper-casing each one
+        if '\n' in sql:
+            logger.info(f"Multi-line response, {sql.count(chr(10)) + 1} lines found")
+            match = _SELECT_LINE_RE.search(sql)
+            if match:
+                # Take this line as the SQL
+                sql = match.group(1)
+                logger.info(f"Extracted SELECT line: {sql[:100]}...")
         
         # Clean up excessive whitespace (but preserve single spaces)
         sql = ' '.join(sql.split())
@@ -157,63 +267,82 @@ Generate the SQL query now:"""
         logger.info(f"Final extracted SQL: {sql}")
         return sql.strip()
     
-    def _validate_sql(self, sql_query: str) -> None:
+    def _minify_sql(self, sql: str) -> str:
+        """
+        Strip comments and collapse whitespace outside quoted literals/identifiers
+        
+        Walks the query token by token, so quote characters inside string literals
+        and comment markers inside quotes are left untouched.
+        """
+        parts = []
+        pending_space = False
+        for match in _SQL_TOKEN_RE.finditer(sql):
+            token = match.group()
+            if token[0].isspace() or token.startswith(('--', '/*')):
+                # Comments separate tokens just like whitespace does
+                pending_space = True
+                continue
+            if pending_space and parts:
+                parts.append(' ')
+            pending_space = False
+            parts.append(token)
+        return ''.join(parts)
+    
+    def _validate_sql(self, sql_query: str, database_type: Optional[str] = None) -> None:
         """
         Validate SQL query for security and correctness
         
+        Parses the query once with sqlglot and checks the tree instead of scanning the
+        text for keywords, so names like "create_date" or 'DROP' inside a literal are not
+        mistaken for statements, and unbalanced quotes surface as tokenizer errors.
+        
+        Args:
+            sql_query: The SQL to validate
+            database_type: SQLAlchemy dialect name of the target database
+        
         Raises:
             Exception: If validation fails
         """
         if not sql_query:
             raise Exception("Generated SQL query is empty")
         
-        # Convert to uppercase for checking
-        sql_upper = sql_query.upper().strip()
+        try:
+            statements = [
+                statement for statement in sqlglot.parse(sql_query, read=_to_sqlglot_dialect(database_type))
+                if statement is not None
+            ]
+        except SqlglotError as e:
+            raise Exception(f"Invalid SQL: {e}. Query: {sql_query}")
         
-        # Must start with SELECT
-        if not sql_upper.startswith("SELECT"):
+        if len(statements) != 1:
+            raise Exception(
+                f"Only a single SELECT statement is allowed, found {len(statements)}"
+            )
+        tree = statements[0]
+        
+        # Must be a SELECT (or a UNION/INTERSECT/EXCEPT of SELECTs)
+        if not isinstance(tree, (exp.Select, exp.SetOperation)):
             raise Exception(
                 "Only SELECT queries are allowed. "
                 f"Query starts with: {sql_query[:20]}"
             )
         
-        # Check for dangerous keywords
-        for keyword in self.dangerous_keywords:
-            # Use word boundaries to avoid false positives
-            pattern = r'\b' + keyword + r'\b'
-            if re.search(pattern, sql_upper):
+        for node in tree.walk():
+            if isinstance(node, _FORBIDDEN_NODES):
                 raise Exception(
-                    f"Query contains forbidden keyword: {keyword}. "
+                    f"Query contains forbidden statement: {node.key.upper()}. "
                     "Only SELECT queries are allowed."
                 )
         
         # Basic syntax check - ensure it has FROM clause
-        if 'FROM' not in sql_upper:
+        if tree.find(exp.From) is None:
             raise Exception(
                 "Invalid SQL: Query must contain a FROM clause"
             )
         
-        # Check for unmatched quotes
-        single_quote_count = sql_query.count("'")
-        if single_quote_count % 2 != 0:
-            raise Exception(
-                f"Invalid SQL: Unmatched single quotes detected. "
-                f"Found {single_quote_count} single quotes (must be even). "
-                f"Query: {sql_query}"
-            )
-        
-        # Check for unmatched double quotes
-        double_quote_count = sql_query.count('"')
-        if double_quote_count % 2 != 0:
-            raise Exception(
-                f"Invalid SQL: Unmatched double quotes detected. "
-                f"Found {double_quote_count} double quotes (must be even). "
-                f"Query: {sql_query}"
-            )
-        
         logger.info("SQL validation passed")
     
-    def validate_sql_syntax(self, sql_query: str) -> bool:
+    def validate_sql_syntax(self, sql_query: str, database_type: Optional[str] = None) -> bool:
         """
         Additional syntax validation (can be extended)
         
@@ -221,7 +350,7 @@ Generate the SQL query now:"""
             True if syntax appears valid
         """
         try:
-            self._validate_sql(sql_query)
+            self._validate_sql(sql_query, database_type)
             return True
         except Exception:
             return False
@@ -1,10 +1,13 @@
 import logging
 from typing import List, Dict, Any
-from datetime import datetime
+from datetime import datetime, timezone
 from service.infrastructure.database_service import database_service
 
 logger = logging.getLogger(__name__)
 
+# Listing fields only; the id arrays can run to thousands of entries per document
+_LISTING_PROJECTION = {"_id": 0, "username": 0, "chunk_ids": 0, "parent_ids": 0}
+
 class UserDocumentsService:
     """Service for managing user-specific documents using MongoDB."""
     
@@ -16,7 +19,7 @@ class UserDocumentsService:
         """Helper to get the user_documents collection."""
         if database_service.db is None:
             await database_service.connect()
-        return database_service.db.user_documents
+        return database_service.user_documents
 
     async def delete_document(self, username: str, filename: str) -> bool:
         """Delete a document by filename for a specific user."""
@@ -45,23 +48,39 @@ class UserDocumentsService:
             logger.error(f"Error deleting documents: {e}")
             return 0
     
+    @staticmethod
+    def _build_doc(username: str, title: str, filename: str, chunk_ids: List[str], parent_ids: List[str] = None, description: str = None, uploaded_at: datetime = None) -> Dict[str, Any]:
+        """
+        Build the user_documents entry for a single indexed document.
+
+        uploaded_at is stored as a native BSON date (UTC) so the uploaded_at index
+        sorts and range-scans by time rather than by string.
+        """
+        document = {
+            "username": username,
+            "title": title,
+            "filename": filename,
+            "chunk_ids": chunk_ids,
+            "parent_ids": parent_ids or [],
+            "chunks": len(chunk_ids),
+            "uploaded_at": uploaded_at or datetime.now(timezone.utc),
+            "indexed": True
+        }
+        if description:
+            document["description"] = description
+        return document
+
     async def add_document(self, username: str, title: str, filename: str, chunk_ids: List[str], parent_ids: List[str] = None, description: str = None) -> Dict[str, Any]:
-        """Add a document entry for a specific user."""
+        """
+        Add a document entry for a specific user.
+
+        Raises:
+            DuplicateKeyError: If the user already has a document with this filename
+        """
         try:
             collection = await self.get_collection()
             
-            document = {
-                "username": username,
-                "title": title,
-                "filename": filename,
-                "chunk_ids": chunk_ids,
-                "parent_ids": parent_ids or [],
-                "chunks": len(chunk_ids),
-                "uploaded_at": datetime.now().isoformat(),
-                "indexed": True
-            }
-            if description:
-                document["description"] = description
+            document = self._build_doc(username, title, filename, chunk_ids, parent_ids, description)
 
             await collection.insert_one(document)
             
@@ -72,20 +91,49 @@ class UserDocumentsService:
             return document
         except Exception as e:
             logger.error(f"Error adding document: {e}")
-            return {}
+            raise e
+
+    async def add_documents(self, docs_spec: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Add several document entries in a single round trip.
+
+        Each item in docs_spec takes the same keyword arguments as add_document.
+        """
+        if not docs_spec:
+            return []
+        try:
+            collection = await self.get_collection()
+            # One timestamp for the whole batch
+            uploaded_at = datetime.now(timezone.utc)
+            documents = [self._build_doc(**spec, uploaded_at=uploaded_at) for spec in docs_spec]
+
+            await collection.insert_many(documents, ordered=False)
+
+            for document in documents:
+                document.pop("_id", None)
+
+            logger.info(f"Added {len(documents)} documents to MongoDB")
+            return documents
+        except Exception as e:
+            logger.error(f"Error adding documents: {e}")
+            return []
     
     async def get_user_documents(self, username: str) -> List[Dict[str, Any]]:
-        """Get all documents for a specific user."""
+        """Get all documents for a specific user, without their chunk and parent ID lists."""
         try:
             collection = await self.get_collection()
-            cursor = collection.find({"username": username}).sort("uploaded_at", -1)
-            
-            documents = []
-            async for doc in cursor:
-                doc.pop("_id", None)
-                documents.append(doc)
-                
-            return documents
+            cursor = collection.find({"username": username}, projection=_LISTING_PROJECTION).sort("uploaded_at", -1)
+            return await cursor.to_list(None)
+        except Exception as e:
+            logger.error(f"Error getting documents for {username}: {e}")
+            return []
+
+    async def get_user_documents_full(self, username: str) -> List[Dict[str, Any]]:
+        """Get all documents for a specific user, including chunk_ids and parent_ids."""
+        try:
+            collection = await self.get_collection()
+            cursor = collection.find({"username": username}, projection={"_id": 0}).sort("uploaded_at", -1)
+            return await cursor.to_list(None)
         except Exception as e:
             logger.error(f"Error getting documents for {username}: {e}")
             return []
@@ -93,11 +141,14 @@ class UserDocumentsService:
     async def get_all_user_chunk_ids(self, username: str) -> List[str]:
         """Get all chunk IDs for a user's documents."""
         try:
-            docs = await self.get_user_documents(username)
-            all_chunk_ids = []
-            for doc in docs:
-                all_chunk_ids.extend(doc.get("chunk_ids", []))
-            return all_chunk_ids
+            collection = await self.get_collection()
+            # Stream each document's chunk_ids; grouping them server-side into one
+            # document could exceed the 16MB BSON limit for large libraries
+            cursor = collection.find({"username": username}, projection={"_id": 0, "chunk_ids": 1})
+            chunk_ids = []
+            async for doc in cursor:
+                chunk_ids.extend(doc.get("chunk_ids", []))
+            return chunk_ids
         except Exception as e:
             logger.error(f"Error getting chunk IDs for {username}: {e}")
             return []
@@ -82,7 +82,12 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         raise credentials_exception
     
     # Use user_service to fetch user from MongoDB
-    user = await user_service.get_user_by_id(user_id=token_data.user_id)
+    # api_keys are replaced by their decrypted form below, and the password hash is
+    # only needed at login, so neither is fetched here
+    user = await user_service.get_user_by_id(
+        user_id=token_data.user_id,
+        projection={"hashed_password": 0, "api_keys": 0}
+    )
     if user is None:
         raise credentials_exception
         
@@ -95,7 +100,10 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 async def authenticate_user(username: str, password: str):
     """Authenticate a user with username and password"""
     # Use user_service to fetch user from MongoDB
-    user = await user_service.get_user_by_username(username)
+    user = await user_service.get_user_by_username(
+        username,
+        projection={"user_id": 1, "username": 1, "hashed_password": 1, "is_active": 1}
+    )
     if not user:
         return False
     if not verify_password(password, user["hashed_password"]):
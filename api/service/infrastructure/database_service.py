@@ -1,5 +1,7 @@
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import AsyncMongoClient
 from lib.config import settings
+from typing import Dict, List
+import asyncio
 import logging
 import os
 
@@ -9,6 +11,12 @@ class DatabaseService:
     def __init__(self):
         self.client = None
         self.db = None
+        # Collection handles, resolved once on connect
+        self.user_documents = None
+        self.users = None
+        self.chat_sessions = None
+        self.parent_chunks = None
+        self._index_task = None
         # Default to local if not set
         self.db_url = os.getenv("DATABASE_URL", "mongodb://localhost:27017")
         self.db_name = os.getenv("MONGO_DB_NAME", "rag_app_db")
@@ -17,47 +25,93 @@ class DatabaseService:
         """Connect to MongoDB."""
         try:
             logger.info(f"Connecting to MongoDB at {self.db_url.split('@')[-1] if '@' in self.db_url else 'localhost'}...")
-            # Set a 5-second timeout for server selection to avoid hanging cold starts
-            self.client = AsyncIOMotorClient(self.db_url, serverSelectionTimeoutMS=5000)
+            # Set a 5-second timeout for server selection to avoid hanging cold starts.
+            # Keep a warm pool so parallel uploads reuse connections instead of paying
+            # a fresh TLS handshake, and compress the wire protocol for document listings.
+            self.client = AsyncMongoClient(
+                self.db_url,
+                serverSelectionTimeoutMS=5000,
+                maxPoolSize=50,
+                minPoolSize=10,
+                maxIdleTimeMS=60000,
+                waitQueueTimeoutMS=2000,
+                retryWrites=True,
+                compressors="zstd,zlib",
+                # Return stored dates as UTC-aware datetimes so they serialize with an offset
+                tz_aware=True,
+            )
             self.db = self.client[self.db_name]
+            self.user_documents = self.db.user_documents
+            self.users = self.db.users
+            self.chat_sessions = self.db.chat_sessions
+            self.parent_chunks = self.db.parent_chunks
             
             # Ping with a timeout to verify connection
-            import asyncio
             await asyncio.wait_for(self.client.admin.command('ping'), timeout=5.0)
             logger.info(f"Successfully connected to MongoDB database: {self.db_name}")
             
-            # Create indexes (non-blocking)
-            await self._create_indexes()
+            # Create indexes in the background; create_index is idempotent and
+            # reads don't need to wait for it
+            self._index_task = asyncio.create_task(self._create_indexes())
             
         except Exception as e:
             logger.error(f"Failed to connect to MongoDB: {e}")
             raise e
 
-    async def _create_indexes(self):
-        """Create necessary indexes."""
-        try:
-            # User Documents - Index by username
-            await self.db.user_documents.create_index("username")
+    async def _create_indexes(self) -> Dict[str, List[Exception]]:
+        """
+        Create necessary indexes concurrently.
+
+        Returns:
+            The errors of any failed index builds, by collection name
+        """
+        indexes = [
+            # User Documents - Index by username, newest first, so listings skip the in-memory sort
+            (self.db.user_documents, [("username", 1), ("uploaded_at", -1)], {}),
+            (self.db.user_documents, [("username", 1), ("filename", 1)], {"unique": True}),
+            (self.db.user_documents, [("username", 1), ("chunk_ids", 1)], {}),
+
+            # Users - Index by user_id, username and email
+            (self.db.users, "user_id", {"unique": True}),
+            (self.db.users, "username", {"unique": True}),
+            (self.db.users, "email", {"unique": True, "sparse": True}),
 
-            # Users - Index by username and email
-            await self.db.users.create_index("username", unique=True)
-            await self.db.users.create_index("email", unique=True, sparse=True)
-            
             # Chat Sessions - Index by session_id and username
-            await self.db.chat_sessions.create_index("session_id", unique=True)
-            await self.db.chat_sessions.create_index("username")
-            
+            (self.db.chat_sessions, "session_id", {"unique": True}),
+            (self.db.chat_sessions, "username", {}),
+
             # Parent Chunks - Index by id
-            await self.db.parent_chunks.create_index("id", unique=True)
-            
+            (self.db.parent_chunks, "id", {"unique": True}),
+        ]
 
-        except Exception as e:
-            logger.error(f"Error creating indexes: {e}")
+        results = await asyncio.gather(
+            *(collection.create_index(keys, **options) for collection, keys, options in indexes),
+            return_exceptions=True
+        )
+        failures: Dict[str, List[Exception]] = {}
+        for (collection, keys, _), result in zip(indexes, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error creating index {keys} on {collection.name}: {result}")
+                failures.setdefault(collection.name, []).append(result)
+        return failures
+
+    async def wait_for_indexes(self, collection_name: str):
+        """
+        Wait for the index build started by connect() to finish.
+
+        Raises:
+            Exception: If any index on collection_name could not be created
+        """
+        if self._index_task is None:
+            return
+        failures = (await self._index_task).get(collection_name)
+        if failures:
+            raise Exception(f"Failed to create {len(failures)} index(es) on {collection_name}: {failures[0]}")
 
     async def close(self):
         """Close MongoDB connection."""
         if self.client:
-            self.client.close()
+            await self.client.close()
             logger.info("MongoDB connection closed.")
 
 # Singleton instance
@@ -1,48 +1,112 @@
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from service.infrastructure.database_service import database_service
+from lib.cache import TTLCache
 from lib.security import security_service
-from datetime import datetime
+from datetime import datetime, timezone
 import uuid
 import logging
 
 
 logger = logging.getLogger(__name__)
 
+# Every authenticated request looks the user up (and decrypts their API keys), so
+# results are kept in memory briefly instead of re-read from MongoDB each time
+USER_CACHE_TTL_SECONDS = 60
+USER_CACHE_MAX_ENTRIES = 10000
+
+
+class UserCache(TTLCache):
+    """
+    TTL-LRU cache of user lookups, keyed by (lookup kind, value[, projection]).
+    
+    Values are copied on the way in and out because callers modify the dicts they get
+    back (get_current_user swaps in decrypted api_keys, the RAG flow adds a model entry).
+    """
+
+    def __init__(self, ttl: float = USER_CACHE_TTL_SECONDS, max_entries: int = USER_CACHE_MAX_ENTRIES):
+        super().__init__(max_entries, ttl)
+
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        """Returns a copy of the cached value for key, or None if missing or expired."""
+        value = super().get(key)
+        return dict(value) if value is not None else None
+
+    def set(self, key: Tuple, value: Dict[str, Any]) -> None:
+        super().set(key, dict(value))
+
+    def invalidate_user(self, user_id: str) -> None:
+        """Drops every entry for user_id: its user documents under any key, and its API keys."""
+        self.evict(
+            lambda key, value: key[:2] in (("api_keys", user_id), ("user_id", user_id))
+            or value.get("user_id") == user_id
+        )
+
+
 class UserService:
     """Service for managing users in MongoDB."""
 
     def __init__(self):
-        pass
+        # Users collection handle, resolved on first use
+        self._collection = None
+        self._indexes_ready = False
+        self._cache = UserCache()
 
     async def get_collection(self):
+        if self._collection is not None:
+            return self._collection
         if database_service.db is None:
             await database_service.connect()
-        return database_service.db.users
+        self._collection = database_service.users
+        return self._collection
+
+    async def _ensure_unique_indexes(self):
+        """
+        Wait until the unique username/email indexes exist before inserting users.
+        
+        Inserts rely on those indexes to reject duplicates, and connect() builds them in
+        the background, so a signup racing startup (or a failed build) must not go ahead.
+        """
+        if self._indexes_ready:
+            return
+        await database_service.wait_for_indexes("users")
+        self._indexes_ready = True
+
+    @staticmethod
+    def _build_user(username: str, hashed_password: str, email: Optional[str] = None) -> Dict[str, Any]:
+        """Build a new user document with a freshly generated user_id."""
+        return {
+            "user_id": str(uuid.uuid4()),
+            "username": username,
+            "hashed_password": hashed_password,
+            "email": email,
+            "created_at": datetime.now(timezone.utc),
+            "is_active": True
+        }
 
     async def create_user(self, username: str, hashed_password: str, email: Optional[str] = None) -> Dict[str, Any]:
-        """Create a new user in MongoDB."""
+        """
+        Create a new user in MongoDB.
+        
+        Uniqueness is enforced by the unique username/email indexes, so the user is
+        inserted directly instead of checked for first.
+        
+        Raises:
+            ValueError: If the username or email is already taken
+        """
         try:
             collection = await self.get_collection()
+            await self._ensure_unique_indexes()
+            user_data = self._build_user(username, hashed_password, email)
             
-            # Check if username already exists
-            existing_user = await collection.find_one({"username": username})
-            if existing_user:
+            try:
+                result = await collection.insert_one(user_data)
+            except DuplicateKeyError as e:
+                key_pattern = (e.details or {}).get("keyPattern", {})
+                if "email" in key_pattern:
+                    raise ValueError(f"Email '{email}' is already registered")
                 raise ValueError(f"Username '{username}' is already taken")
             
-            # Generate unique user_id
-            user_id = str(uuid.uuid4())
-            
-            user_data = {
-                "user_id": user_id,
-                "username": username,
-                "hashed_password": hashed_password,
-                "email": email,
-                "created_at": datetime.utcnow().isoformat(),
-                "is_active": True
-            }
-            
-            result = await collection.insert_one(user_data)
-            
             # Return user data with proper simple types
             user_data["_id"] = str(result.inserted_id)
             return user_data
@@ -51,80 +115,140 @@ class UserService:
             logger.error(f"Error creating user {username}: {e}")
             raise e
 
-    async def get_user_by_username(self, username: str) -> Optional[Dict[str, Any]]:
-        """Retrieve a user by username."""
-        try:
-            collection = await self.get_collection()
-            user = await collection.find_one({"username": username})
+    async def create_users_bulk(self, users: List[Tuple[str, str, Optional[str]]]) -> List[Any]:
+        """
+        Create several users with a single unordered insert_many.
+        
+        Args:
+            users: (username, hashed_password, email) tuples
             
-            if user:
-                user["_id"] = str(user["_id"])
-                return user
+        Returns:
+            One entry per input, in order: the created user data, or a ValueError
+            naming the username/email that is already taken
+        """
+        if not users:
+            return []
+        
+        collection = await self.get_collection()
+        await self._ensure_unique_indexes()
+        docs = [self._build_user(username, hashed_password, email) for username, hashed_password, email in users]
+        results: List[Any] = list(docs)
+        
+        try:
+            await collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                index = error["index"]
+                username, _, email = users[index]
+                if error.get("code") != 11000:
+                    results[index] = ValueError(f"Could not create user '{username}': {error.get('errmsg')}")
+                elif "email" in error.get("keyPattern", {}):
+                    results[index] = ValueError(f"Email '{email}' is already registered")
+                else:
+                    results[index] = ValueError(f"Username '{username}' is already taken")
+        
+        # insert_many sets _id on each inserted document in place
+        for doc in docs:
+            if "_id" in doc:
+                doc["_id"] = str(doc["_id"])
+        return results
+
+    async def _find_user(self, field: str, value: str, projection: Optional[Dict[str, int]]) -> Optional[Dict[str, Any]]:
+        """Cached find_one on a unique user field, returning only the projected fields."""
+        cache_key = (field, value, tuple(sorted(projection.items())) if projection else None)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        collection = await self.get_collection()
+        user = await collection.find_one({field: value}, projection)
+        if not user:
             return None
-            
+        if "_id" in user:
+            user["_id"] = str(user["_id"])
+        self._cache.set(cache_key, user)
+        return user
+
+    async def get_user_by_username(self, username: str, projection: Optional[Dict[str, int]] = None) -> Optional[Dict[str, Any]]:
+        """Retrieve a user by username, optionally limited to the fields in projection."""
+        try:
+            return await self._find_user("username", username, projection)
         except Exception as e:
             logger.error(f"Error fetching user {username}: {e}")
             return None
 
-    async def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
-        """Retrieve a user by user_id."""
+    async def get_user_by_id(self, user_id: str, projection: Optional[Dict[str, int]] = None) -> Optional[Dict[str, Any]]:
+        """Retrieve a user by user_id, optionally limited to the fields in projection."""
         try:
-            collection = await self.get_collection()
-            user = await collection.find_one({"user_id": user_id})
-            
-            if user:
-                user["_id"] = str(user["_id"])
-                return user
-            return None
-            
+            return await self._find_user("user_id", user_id, projection)
         except Exception as e:
             logger.error(f"Error fetching user by id {user_id}: {e}")
             return None
 
-    async def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
-        """Retrieve a user by email."""
+    async def get_user_by_email(self, email: str, projection: Optional[Dict[str, int]] = None) -> Optional[Dict[str, Any]]:
+        """Retrieve a user by email, optionally limited to the fields in projection."""
         try:
             if not email:
                 return None
-                
-            collection = await self.get_collection()
-            user = await collection.find_one({"email": email})
-            
-            if user:
-                user["_id"] = str(user["_id"])
-                return user
-            return None
-            
+            return await self._find_user("email", email, projection)
         except Exception as e:
             logger.error(f"Error fetching user by email {email}: {e}")
             return None
 
+    async def get_users_by_ids(self, user_ids: List[str], projection: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+        """Retrieve many users in one $in query, optionally limited to the fields in projection."""
+        if not user_ids:
+            return []
+        try:
+            collection = await self.get_collection()
+            cursor = collection.find({"user_id": {"$in": list(user_ids)}}, projection)
+            users = await cursor.to_list(None)
+            for user in users:
+                if "_id" in user:
+                    user["_id"] = str(user["_id"])
+            return users
+        except Exception as e:
+            logger.error(f"Error fetching users by id: {e}")
+            return []
+
 
     async def update_api_keys(self, user_id: str, api_keys: Dict[str, str]) -> bool:
-        """Update user API keys securely."""
+        """
+        Update user API keys securely.
+        
+        The keys are merged server-side in a single update: provided keys are
+        encrypted and set, and keys given as an empty string are removed.
+        
+        Returns:
+            False if the user does not exist
+        """
         try:
             collection = await self.get_collection()
             
-            # Fetch existing user to get current keys (to merge if needed, or just overwrite)
-            user = await collection.find_one({"user_id": user_id})
-            if not user:
-                return False
-                
-            current_keys = user.get("api_keys", {})
-            
-            # Encrypt and update keys
+            set_ops = {}
+            unset_ops = {}
             for provider, key in api_keys.items():
+                # Provider names become field paths; skip ones MongoDB would misread
+                if "." in provider or provider.startswith("$"):
+                    logger.warning(f"Ignoring invalid API key provider name: {provider!r}")
+                    continue
                 if key: # If key is provided
-                    current_keys[provider] = security_service.encrypt_value(key)
-                elif provider in current_keys and key == "": 
+                    set_ops[f"api_keys.{provider}"] = security_service.encrypt_value(key)
+                elif key == "":
                     # If empty string provided, remove the key
-                    del current_keys[provider]
+                    unset_ops[f"api_keys.{provider}"] = ""
             
-            await collection.update_one(
-                {"user_id": user_id},
-                {"$set": {"api_keys": current_keys}}
-            )
-            return True
+            update = {}
+            if set_ops:
+                update["$set"] = set_ops
+            if unset_ops:
+                update["$unset"] = unset_ops
+            if not update:
+                return await collection.count_documents({"user_id": user_id}, limit=1) > 0
+            
+            result = await collection.update_one({"user_id": user_id}, update)
+            self._cache.invalidate_user(user_id)
+            return result.matched_count > 0
             
         except Exception as e:
             logger.error(f"Error updating API keys for user {user_id}: {e}")
@@ -132,19 +256,20 @@ class UserService:
 
     async def get_decrypted_api_keys(self, user_id: str) -> Dict[str, str]:
         """Retrieve decrypted API keys for a user."""
+        cache_key = ("api_keys", user_id)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
         try:
             collection = await self.get_collection()
-            user = await collection.find_one({"user_id": user_id})
+            user = await collection.find_one({"user_id": user_id}, {"_id": 0, "api_keys": 1})
             
             if not user or "api_keys" not in user:
                 return {}
             
-            decrypted_keys = {}
-            for provider, encrypted_key in user["api_keys"].items():
-                val = security_service.decrypt_value(encrypted_key)
-                if val:
-                    decrypted_keys[provider] = val
-                
+            decrypted_keys = security_service.decrypt_values(user["api_keys"])
+            
+            self._cache.set(cache_key, decrypted_keys)
             return decrypted_keys
             
         except Exception as e:
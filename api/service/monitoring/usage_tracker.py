@@ -16,10 +16,12 @@ class UsageTracker:
         return cls._instance
 
     def increment(self):
+        # Only the counter update is guarded; logging happens after the lock is released
+        # so concurrent callers never queue behind I/O
         with self._lock:
             self._count += 1
-            print(f"\n[API STATS] Total Gemini API Calls so far: {self._count}\n")
-            logger.info(f"Gemini API Call Increment. Total: {self._count}")
+            count = self._count
+        logger.info(f"Gemini API Call Increment. Total: {count}")
 
     def get_count(self):
         with self._lock:
@@ -1,12 +1,58 @@
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Set, Tuple
 from fastembed import TextEmbedding
+from lib.cache import TTLCache
 from lib.config import settings
+import hashlib
 import logging
 import asyncio
 import time
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# FastEmbed serves this model from its int8-quantized ONNX export
+# (Qdrant/bge-small-en-v1.5-onnx-Q, ~67MB), so inference already runs on int8 weights.
+# Swapping in an FP32 export, or another model, changes both speed and the vector space.
+EMBEDDING_MODEL_NAME = "BAAI/bge-small-en-v1.5"
+EMBEDDING_DIM = 384
+
+# ONNX Runtime already spreads one inference across every core (intra-op threads), so
+# inference calls run one at a time on a dedicated thread instead of in parallel on the
+# default executor, where they would oversubscribe the cores and contend for the GIL
+# during tokenization
+_inference_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fastembed")
+
+# Concurrent single-text requests arriving within this window are embedded in one model run
+_BATCH_WINDOW_SECONDS = 0.005
+_MAX_BATCH_TEXTS = 32
+
+# Recently embedded texts (re-uploaded documents, retried chunks, repeated queries)
+# are served from memory. Vectors are kept as packed float16 arrays (~768B each):
+# half the memory of float32, with rounding far below what moves a cosine ranking.
+# Fresh vectors are rounded the same way before being returned, so a text always gets
+# the same vector whether or not it was cached. They are promoted back to float32
+# when handed out
+EMBEDDING_CACHE_MAX_ENTRIES = 20000
+EMBEDDING_CACHE_DTYPE = np.float16
+
+
+class EmbeddingCache(TTLCache):
+    """
+    LRU cache of embeddings, keyed by a SHA-256 of the model name and text. Entries
+    don't expire, since a text's embedding only changes with the model.
+    
+    Only touched from the event loop, never from the inference worker threads.
+    """
+
+    def __init__(self, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        super().__init__(max_entries)
+
+    @staticmethod
+    def make_key(text: str) -> bytes:
+        return hashlib.sha256(f"{EMBEDDING_MODEL_NAME}:{text}".encode("utf-8")).digest()
+
+
 class EmbeddingService:
     def __init__(self):
         """
@@ -14,22 +60,86 @@ class EmbeddingService:
         Produces 384-dimensional vectors.
         """
         try:
-            logger.info("Initializing FastEmbed Service (BAAI/bge-small-en-v1.5)...")
-            # This will download the model if not present (~something small, <1GB)
-            self.model = TextEmbedding(model_name="BAAI/bge-small-en-v1.5")
-            self.output_dim = 384
+            logger.info(f"Initializing FastEmbed Service ({EMBEDDING_MODEL_NAME})...")
+            providers = None
+            if settings.embedding_providers:
+                providers = [p.strip() for p in settings.embedding_providers.split(",") if p.strip()]
+                logger.info(f"FastEmbed execution providers: {providers}")
+            # This will download the quantized model if not present
+            self.model = TextEmbedding(
+                model_name=EMBEDDING_MODEL_NAME,
+                threads=settings.embedding_threads,
+                providers=providers
+            )
+            self.output_dim = EMBEDDING_DIM
             logger.info("FastEmbed Service initialized successfully.")
         except Exception as e:
             logger.error(f"Failed to initialize FastEmbed Service: {e}")
             self.model = None
+        self.cache = EmbeddingCache()
+
+    def warmup(self) -> None:
+        """
+        Runs one throwaway inference so ONNX Runtime finishes its lazy setup (graph
+        optimization, buffer allocation) before the first real request. Blocking;
+        call it before serving requests.
+        """
+        if not self.model:
+            return
+        try:
+            self._embed_sync(["warmup"])
+            logger.info("FastEmbed model warmed up.")
+        except Exception as e:
+            logger.warning(f"FastEmbed warmup failed: {e}")
+
+    async def _embed(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
+        """
+        Embeds texts, serving cached vectors and sending only the misses to the model
+        in a worker thread. Shared by the single and batch paths.
+        """
+        keys = [self.cache.make_key(text) for text in texts]
+        vectors = [self.cache.get(key) for key in keys]
+        misses = [i for i, vector in enumerate(vectors) if vector is None]
+        if misses:
+            loop = asyncio.get_running_loop()
+            computed = await loop.run_in_executor(
+                _inference_executor, self._embed_sync, [texts[i] for i in misses], batch_size
+            )
+            for i, vector in zip(misses, computed):
+                # astype copies the row out, so a cached vector holds only its own bytes
+                # instead of pinning the whole batch matrix it was sliced from
+                vectors[i] = vector.astype(EMBEDDING_CACHE_DTYPE)
+                self.cache.set(keys[i], vectors[i])
+        # Vectors stay packed up to here; the Pinecone client takes plain lists, so
+        # promote and convert once for the whole batch rather than vector by vector
+        return np.stack(vectors).astype(np.float32, copy=False).tolist()
+
+    def _embed_sync(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Embeds texts with FastEmbed, blocking. Returns one float32 row per text.
+        
+        Duplicate texts (repeated headers, boilerplate, the same query from concurrent
+        requests) are embedded once and copied back to every position they occupy.
+        """
+        unique_texts = list(dict.fromkeys(texts))
+        slots = {text: i for i, text in enumerate(unique_texts)}
+        # Feed texts shortest-first so each batch holds similar lengths and
+        # the tokenizer pads to a near-uniform width instead of the batch's longest text.
+        order = sorted(range(len(unique_texts)), key=lambda i: len(unique_texts[i]))
+        ordered_texts = [unique_texts[i] for i in order]
+        # fastembed generator -> one contiguous float32 matrix
+        matrix = np.asarray(list(self.model.embed(ordered_texts, batch_size=batch_size)), dtype=np.float32)
+        restored = np.empty_like(matrix)
+        restored[order] = matrix
+        return restored[[slots[text] for text in texts]]
 
     async def get_embedding(self, text: str) -> List[float]:
         """
         Generates a 384-dimensional vector embedding for the given text using local FastEmbed model.
-        Running in a thread executor to ensure async compatibility.
+        Running in a worker thread to keep CPU-bound inference off the event loop.
         """
-        if not text or not isinstance(text, str):
-            logger.warning("get_embedding called with empty or invalid text.")
+        if not text:
+            logger.warning("get_embedding called with empty text.")
             return []
         
         if not self.model:
@@ -37,15 +147,7 @@ class EmbeddingService:
             return []
 
         try:
-            loop = asyncio.get_running_loop()
-            # fastembed's embed method returns a generator, so we list() it.
-            # We pass a list of ONE text.
-            # run_in_executor prevents blocking the event loop with CPU-bound model inference.
-            embeddings = await loop.run_in_executor(
-                None, 
-                lambda: list(self.model.embed([text]))
-            )
-            return embeddings[0].tolist() if hasattr(embeddings[0], 'tolist') else list(embeddings[0])
+            return await _embedding_batcher.submit(text)
         except Exception as e:
             logger.error(f"Failed to generate embedding: {e}")
             return []
@@ -64,18 +166,9 @@ class EmbeddingService:
         logger.info(f"Processing {len(texts)} texts with FastEmbed")
         
         try:
-            loop = asyncio.get_running_loop()
-            
             # fastembed handles batching internally efficiently, 
-            # but we run the whole operation in executor to be safe async-wise.
-            def _process_batch():
-                # fastembed generator -> list
-                return list(self.model.embed(texts, batch_size=batch_size))
-            
-            embeddings = await loop.run_in_executor(None, _process_batch)
-            
-            # Convert numpy arrays to lists if necessary
-            result = [e.tolist() if hasattr(e, 'tolist') else list(e) for e in embeddings]
+            # but we run the whole operation in a worker thread to be safe async-wise.
+            result = await self._embed(texts, batch_size)
             
             logger.info(f"Successfully generated {len(result)} embeddings locally")
             return result
@@ -88,5 +181,60 @@ class EmbeddingService:
             return [[] for _ in texts]
 
 
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text embedding requests into batches.
+    
+    A batch is flushed once it holds _MAX_BATCH_TEXTS texts or _BATCH_WINDOW_SECONDS
+    after its first text arrived, and is embedded in one call in a worker thread.
+    """
+
+    def __init__(self, service: EmbeddingService):
+        self.service = service
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer = None
+        # In-flight batch tasks; held here so they aren't garbage-collected mid-run
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        self._pending.append((text, future))
+        if len(self._pending) >= _MAX_BATCH_TEXTS:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(_BATCH_WINDOW_SECONDS, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        texts = [text for text, _ in batch]
+        try:
+            embeddings = await self.service._embed(texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        if len(batch) > 1:
+            logger.debug(f"Embedded {len(batch)} concurrent requests in one batch")
+        for (_, future), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result(embedding)
+
+
 # Singleton instance
 embedding_service = EmbeddingService()
+_embedding_batcher = EmbeddingBatcher(embedding_service)
@@ -1,5 +1,7 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+from lib.cache import TTLCache
 from lib.config import settings
+import hashlib
 import logging
 import asyncio
 import asyncio
@@ -15,6 +17,16 @@ logger = logging.getLogger(__name__)
 # Constants for model names
 GENERATIVE_MODEL_NAME = "gemini-2.5-flash"  # A fast and capable model for generation/reranking
 
+# Response cache sizing. Answers and descriptions expire after an hour by default;
+# callers with more stable prompts (e.g. SQL generation against a fixed schema) pass
+# a longer TTL
+RESPONSE_CACHE_MAX_ENTRIES = 512
+DEFAULT_RESPONSE_CACHE_TTL_SECONDS = 3600
+
+# Lifetime of explicit context caches (Gemini CachedContent) holding long, stable
+# prompt prefixes
+DEFAULT_CONTEXT_CACHE_TTL_SECONDS = 3600
+
 # Suppress noisy logs from Google GenAI SDK
 logging.getLogger("google.genai").setLevel(logging.WARNING) 
 logging.getLogger("google.generativeai").setLevel(logging.WARNING)
@@ -24,8 +36,25 @@ logging.getLogger("google.api_core").setLevel(logging.WARNING)
 logging.getLogger("google_genai").setLevel(logging.WARNING)
 logging.getLogger("google_genai.models").setLevel(logging.WARNING)
 
+class ResponseCache(TTLCache):
+    """
+    TTL-LRU cache of generated text, keyed by model name and a SHA-256 of the prompt.
+    Callers pass the TTL per entry.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        super().__init__(max_entries)
+
+    @staticmethod
+    def make_key(model: str, prompt: str) -> Tuple[str, str]:
+        return model, hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
 class GeminiService:
     def __init__(self):
+        # Identical prompts (re-uploaded documents, repeated questions against the
+        # same schema) are answered from here instead of another Gemini round trip
+        self.response_cache = ResponseCache()
         # Safety settings to configure what content is blocked.
         self.safety_settings = [
             types.SafetySetting(
@@ -74,6 +103,10 @@ class GeminiService:
             f"Title: {title or ''}\n"
             f"Content: {content[:2000]}"
         )
+        cache_key = self.response_cache.make_key(GENERATIVE_MODEL_NAME, prompt)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            return cached
         try:
             # New SDK async generation
             usage_tracker.increment()
@@ -84,10 +117,35 @@ class GeminiService:
                     safety_settings=self.safety_settings
                 )
             )
-            return response.text.strip()
+            description = response.text.strip()
+            self.response_cache.set(cache_key, description, DEFAULT_RESPONSE_CACHE_TTL_SECONDS)
+            return description
         except Exception as e:
             logger.error(f"Failed to generate description: {e}")
             return "No description available."
+
+    async def generate_descriptions_batch(self, items: List[Dict[str, Any]], concurrency: int = 8, api_key: str = None) -> List[str]:
+        """
+        Generates descriptions for several documents concurrently using Gemini.
+        
+        Args:
+            items: Documents as dicts with "content" and optional "title"
+            concurrency: Maximum number of requests in flight at once
+            
+        Returns:
+            One description per item, in order
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def describe(item: Dict[str, Any]) -> str:
+            async with semaphore:
+                return await self.generate_description(item.get("content"), item.get("title"), api_key)
+
+        results = await asyncio.gather(*(describe(item) for item in items), return_exceptions=True)
+        return [
+            "No description available." if isinstance(result, Exception) else result
+            for result in results
+        ]
             
     async def generate_chat_title(self, query: str, api_key: str = None) -> str:
         """
@@ -123,13 +181,73 @@ class GeminiService:
             logger.error(f"Failed to generate chat title: {e}")
             return "New Chat"
         
+    async def create_context_cache(
+        self,
+        contents: str,
+        model: str = None,
+        ttl_seconds: int = DEFAULT_CONTEXT_CACHE_TTL_SECONDS,
+        api_key: str = None
+    ) -> Optional[str]:
+        """
+        Uploads a stable prompt prefix as a Gemini CachedContent, so later calls can
+        reference it by name via generate_answer(cached_content=...) instead of
+        resending (and being billed for) the full text every time.
+        
+        Returns:
+            The cache resource name, or None if caching is unavailable (missing key,
+            prefix below the model's minimum cacheable size, etc.)
+        """
+        client = self._get_client(api_key)
+        if not client:
+            return None
+        try:
+            cache = await client.aio.caches.create(
+                model=model or GENERATIVE_MODEL_NAME,
+                config=types.CreateCachedContentConfig(
+                    contents=[contents],
+                    ttl=f"{int(ttl_seconds)}s"
+                )
+            )
+            logger.info(f"Created Gemini context cache {cache.name}")
+            return cache.name
+        except Exception as e:
+            logger.warning(f"Failed to create Gemini context cache: {e}")
+            return None
+
     async def initialize_gemini(self):
         """Deprecated: No longer needed with per-request clients."""
         logger.info("Gemini Service initialized (stateless mode).")
         return True
 
-    async def generate_answer(self, prompt: str, api_key: str = None, model: str = None) -> str:
-        """Generates a text response based on a prompt using an async call."""
+    async def generate_answer(
+        self,
+        prompt: str,
+        api_key: str = None,
+        model: str = None,
+        cache_ttl: Optional[float] = DEFAULT_RESPONSE_CACHE_TTL_SECONDS,
+        cached_content: Optional[str] = None
+    ) -> str:
+        """
+        Generates a text response based on a prompt using an async call.
+        
+        Responses to a byte-identical prompt on the same model are served from the
+        in-process response cache for cache_ttl seconds. Pass cache_ttl=None to
+        always call the model.
+        
+        cached_content names a context cache from create_context_cache that the
+        prompt continues; it must have been created for the same model.
+        """
+        model = model or GENERATIVE_MODEL_NAME
+        cache_key = None
+        if cache_ttl:
+            cache_key = self.response_cache.make_key(
+                model, prompt if cached_content is None else f"{cached_content}\n{prompt}"
+            )
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Serving Gemini response from cache")
+                return cached
+        
         client = self._get_client(api_key)
         if not client:
             logger.error("Gemini client could not be initialized (Missing Key).")
@@ -139,12 +257,16 @@ class GeminiService:
             # New SDK async generation
             usage_tracker.increment()
             response = await client.aio.models.generate_content(
-                model=model or GENERATIVE_MODEL_NAME,
+                model=model,
                 contents=prompt,
                 config=types.GenerateContentConfig(
-                    safety_settings=self.safety_settings
+                    safety_settings=self.safety_settings,
+                    cached_content=cached_content
                 )
             )
+            # Only real model output is cached, never the fallback messages below
+            if cache_key is not None and response.text:
+                self.response_cache.set(cache_key, response.text, cache_ttl)
             return response.text
         except Exception as e:
             logger.error(f"Failed to generate answer: {e}")
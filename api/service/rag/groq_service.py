@@ -60,6 +60,29 @@ class GroqService:
         except Exception as e:
             logger.error(f"Failed to generate description: {e}")
             return "No description available."
+
+    async def generate_descriptions_batch(self, items: List[Dict[str, Any]], concurrency: int = 8, api_key: str = None) -> List[str]:
+        """
+        Generates descriptions for several documents concurrently using Groq.
+        
+        Args:
+            items: Documents as dicts with "content" and optional "title"
+            concurrency: Maximum number of requests in flight at once
+            
+        Returns:
+            One description per item, in order
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def describe(item: Dict[str, Any]) -> str:
+            async with semaphore:
+                return await self.generate_description(item.get("content"), item.get("title"), api_key)
+
+        results = await asyncio.gather(*(describe(item) for item in items), return_exceptions=True)
+        return [
+            "No description available." if isinstance(result, Exception) else result
+            for result in results
+        ]
             
     async def generate_chat_title(self, query: str, api_key: str = None) -> str:
         """
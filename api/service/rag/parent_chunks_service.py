@@ -1,19 +1,27 @@
 import logging
 from typing import List, Dict, Any, Optional
+from pymongo import UpdateOne
 from service.infrastructure.database_service import database_service
 
 logger = logging.getLogger(__name__)
 
+# Upserts per bulk_write call, keeping each batch well under the 16MB BSON limit
+_UPSERT_BATCH_SIZE = 1000
+
 class ParentChunksService:
     """Service for managing parent chunks using MongoDB."""
     
     def __init__(self):
-        pass
+        self._index_ready = False
 
     async def get_collection(self):
         if database_service.db is None:
             await database_service.connect()
-        return database_service.db.parent_chunks
+        if not self._index_ready:
+            # Upserts and $in lookups by id rely on the unique id index, which connect() builds in the background
+            await database_service.wait_for_indexes("parent_chunks")
+            self._index_ready = True
+        return database_service.parent_chunks
     
     async def store_parent_chunks(self, parent_chunks: List[Dict[str, Any]]) -> bool:
         """Store parent chunks in MongoDB."""
@@ -23,26 +31,14 @@ class ParentChunksService:
                 
             collection = await self.get_collection()
             
-            # Use chunks id as _id for deduplication
-            ops = []
-            for chunk in parent_chunks:
-                # Ensure we don't duplicate
-                chunk_data = chunk.copy()
-                chunk_id = chunk_data.get("id")
-                if not chunk_id:
-                    continue
-                    
-                # We can use update_one with upsert=True to avoid duplicates
-                # Or insert_many with ordered=False and ignore duplicate key errors
-                # Given the scale, loop with explicit upsert is safer for now.
-                # For bulk performance, we could use bulk_write, but let's keep it simple for now.
-                
-                # Check if exists first? No, upsert is better.
-                await collection.update_one(
-                    {"id": chunk_id},
-                    {"$set": chunk_data},
-                    upsert=True
-                )
+            # Upsert on chunk id to avoid duplicates, sending all upserts in a few bulk_write calls
+            ops = [
+                UpdateOne({"id": chunk["id"]}, {"$set": chunk}, upsert=True)
+                for chunk in parent_chunks
+                if chunk.get("id")
+            ]
+            for start in range(0, len(ops), _UPSERT_BATCH_SIZE):
+                await collection.bulk_write(ops[start:start + _UPSERT_BATCH_SIZE], ordered=False)
                 
             logger.info(f"Stored {len(parent_chunks)} parent chunks in MongoDB")
             return True
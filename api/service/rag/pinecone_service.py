@@ -1,5 +1,6 @@
 from typing import List, Dict, Any, Optional
 from lib.config import settings
+import asyncio
 import logging
 import pinecone
 from pinecone import Pinecone, ServerlessSpec
@@ -8,6 +9,12 @@ import os
 
 logger = logging.getLogger(__name__)
 
+# Upserts are sent in batches of this size, a few in flight at once so request
+# latency overlaps without overrunning Pinecone's write rate limits. The limit is
+# shared by all concurrent uploads, not applied per call
+_UPSERT_BATCH_SIZE = 100
+_MAX_CONCURRENT_UPSERTS = 4
+
 class PineconeService:
     """
     Service for interacting with Pinecone Vector Database.
@@ -17,6 +24,7 @@ class PineconeService:
         self.index_name = os.getenv("PINECONE_INDEX_NAME", "rag-index-384")
         self.dimension = settings.embedding_dim
         self.pc = None
+        self._upsert_slots = asyncio.Semaphore(_MAX_CONCURRENT_UPSERTS)
         
         # Parent chunks are now managed by ParentChunksService (MongoDB)
         
@@ -73,11 +81,16 @@ class PineconeService:
             
         try:
             # Pinecone upsert accepts list of tuples or dicts
-            # We already have the correct structure, but let's be safe via batching
-            batch_size = 100
-            for i in range(0, len(vectors), batch_size):
-                batch = vectors[i:i + batch_size]
-                self.index.upsert(vectors=batch)
+            # We already have the correct structure, but let's be safe via batching.
+            # The client is synchronous, so each batch runs in a worker thread.
+            async def _upsert_batch(batch: List[Dict[str, Any]]) -> None:
+                async with self._upsert_slots:
+                    await asyncio.to_thread(self.index.upsert, vectors=batch)
+
+            await asyncio.gather(*(
+                _upsert_batch(vectors[i:i + _UPSERT_BATCH_SIZE])
+                for i in range(0, len(vectors), _UPSERT_BATCH_SIZE)
+            ))
             
             logger.info(f"Upserted {len(vectors)} vectors to Pinecone.")
             return True
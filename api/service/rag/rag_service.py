@@ -237,7 +237,7 @@ class RAGService:
             
             # Use FlashRank to rerank documents locally
             # This implements the Post-Retrieval Mechanism (Section 4.1) from Modular RAG docs
-            reranked_chunks = rerank_service.rerank_documents(query=query, documents=chunks, top_n=keep_count)
+            reranked_chunks = await rerank_service.arerank_documents(query=query, documents=chunks, top_n=keep_count)
             
             # Apply relevance scoring and filtering
             # Note: FlashRank provides normalized scores
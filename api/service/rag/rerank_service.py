@@ -1,10 +1,25 @@
-from typing import List, Dict, Any
+from collections import defaultdict
+from typing import List, Dict, Any, Set, Tuple
+import asyncio
+import bisect
+import heapq
 import logging
+import numpy as np
 from flashrank import Ranker, RerankRequest
 from lib.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Concurrent rerank requests arriving within this window are scored in one model run
+_BATCH_WINDOW_SECONDS = 0.05
+_MAX_BATCH_REQUESTS = 8
+# Upper bounds (inclusive) of the document-count bins; requests are only batched with
+# others of similar size so short requests aren't padded out by long ones
+_BATCH_BIN_BOUNDS = (5, 12, 20)
+
+# (query, documents, top_n)
+RerankJob = Tuple[str, List[Dict[str, Any]], int]
+
 class RerankService:
     """
     Service for local document reranking using FlashRank.
@@ -32,6 +47,111 @@ class RerankService:
             logger.error(f"Failed to initialize FlashRank Service: {e}")
             self.ranker = None
 
+    def _build_passages(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Prepare documents in the passage format FlashRank expects."""
+        # FlashRank expects list of dicts with "id" and "text" (or similar)
+        passages = []
+        for i, doc in enumerate(documents):
+            content = doc.get("metadata", {}).get("content", "")
+            # Create a unique ID if not present
+            doc_id = doc.get("id", str(i))
+            
+            passages.append({
+                "id": doc_id,
+                "text": content,
+                "meta": {"original_index": i} # Keep track of original document
+            })
+        return passages
+
+    def _map_results(self, results: List[Dict[str, Any]], documents: List[Dict[str, Any]], top_n: int) -> List[Dict[str, Any]]:
+        """
+        Map ranked passages back to copies of the original documents with 'score' added.
+        
+        Only the first top_n results are copied; results must already be ranked.
+        """
+        reranked_docs = []
+        for res in results[:top_n]:
+            # Find original doc
+            original_idx = res.get("meta", {}).get("original_index")
+            if original_idx is not None and 0 <= original_idx < len(documents):
+                doc = documents[original_idx].copy()
+                # Add normalized score
+                score = res.get('score', 0.0)
+                doc['score'] = score
+                reranked_docs.append(doc)
+        
+        if reranked_docs and all(d['score'] == 0.0 for d in reranked_docs):
+             logger.warning("FlashRank returned all zero scores. This might indicate an issue with the model or input.")
+
+        return reranked_docs
+
+    def _score_pairs(self, pairs: List[List[str]]) -> np.ndarray:
+        """
+        Score (query, passage) pairs with the cross-encoder in a single ONNX run.
+        
+        Mirrors FlashRank's pairwise scoring, but the pairs may come from different
+        queries since a cross-encoder scores every pair independently.
+        """
+        encoded = self.ranker.tokenizer.encode_batch(pairs)
+        input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        token_type_ids = np.array([e.type_ids for e in encoded], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+
+        onnx_input = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if np.any(token_type_ids):
+            onnx_input["token_type_ids"] = token_type_ids
+
+        logits = self.ranker.session.run(None, onnx_input)[0]
+        if logits.shape[1] == 1:
+            return 1 / (1 + np.exp(-logits.flatten()))
+        exp_logits = np.exp(logits)
+        return exp_logits[:, 1] / np.sum(exp_logits, axis=1)
+
+    def rerank_many(self, jobs: List[RerankJob]) -> List[List[Dict[str, Any]]]:
+        """
+        Rerank several (query, documents, top_n) requests together.
+        
+        All query/passage pairs are scored in one model run when the ranker is a
+        pairwise cross-encoder; otherwise each request is reranked on its own.
+        """
+        if not self.ranker or getattr(self.ranker, "llm_model", None) is not None:
+            return [self.rerank_documents(query, documents, top_n) for query, documents, top_n in jobs]
+
+        try:
+            passages_per_job = [self._build_passages(documents) for _, documents, _ in jobs]
+            pairs = [
+                [query, passage["text"]]
+                for (query, _, _), passages in zip(jobs, passages_per_job)
+                for passage in passages
+            ]
+            scores = self._score_pairs(pairs) if pairs else []
+
+            results = []
+            offset = 0
+            for (_, documents, top_n), passages in zip(jobs, passages_per_job):
+                for passage, score in zip(passages, scores[offset:offset + len(passages)]):
+                    passage["score"] = score
+                offset += len(passages)
+                # Only the top_n survive, so select them instead of sorting every passage
+                top_passages = heapq.nlargest(top_n, passages, key=lambda p: p["score"])
+                results.append(self._map_results(top_passages, documents, top_n))
+
+            logger.info(f"Reranked {len(jobs)} requests ({len(pairs)} pairs) locally using FlashRank in one batch")
+            return results
+        except Exception as e:
+            logger.error(f"Error during batched local reranking: {e}")
+            # Fallback to original order
+            return [documents[:top_n] for _, documents, top_n in jobs]
+
+    async def arerank_documents(self, query: str, documents: List[Dict[str, Any]], top_n: int = 5) -> List[Dict[str, Any]]:
+        """
+        Async variant of rerank_documents. Concurrent requests are coalesced into one
+        batched model run, executed off the event loop.
+        """
+        if not documents or not self.ranker:
+            return self.rerank_documents(query, documents, top_n)
+        return await _rerank_batcher.submit(query, documents, top_n)
+
     def rerank_documents(self, query: str, documents: List[Dict[str, Any]], top_n: int = 5) -> List[Dict[str, Any]]:
         """
         Rerank a list of documents based on their relevance to the query.
@@ -51,18 +171,7 @@ class RerankService:
 
         try:
             # Prepare data for FlashRank
-            # FlashRank expects list of dicts with "id" and "text" (or similar)
-            passages = []
-            for i, doc in enumerate(documents):
-                content = doc.get("metadata", {}).get("content", "")
-                # Create a unique ID if not present
-                doc_id = doc.get("id", str(i))
-                
-                passages.append({
-                    "id": doc_id,
-                    "text": content,
-                    "meta": {"original_index": i} # Keep track of original document
-                })
+            passages = self._build_passages(documents)
 
             if not passages:
                 return []
@@ -71,27 +180,73 @@ class RerankService:
             results = self.ranker.rerank(rerank_request)
             
             # Map results back to original documents
-            reranked_docs = []
-            for res in results:
-                # Find original doc
-                original_idx = res.get("meta", {}).get("original_index")
-                if original_idx is not None and 0 <= original_idx < len(documents):
-                    doc = documents[original_idx].copy()
-                    # Add normalized score
-                    score = res.get('score', 0.0)
-                    doc['score'] = score
-                    reranked_docs.append(doc)
-            
-            if reranked_docs and all(d['score'] == 0.0 for d in reranked_docs):
-                 logger.warning("FlashRank returned all zero scores. This might indicate an issue with the model or input.")
+            reranked_docs = self._map_results(results, documents, top_n)
 
             logger.info(f"Reranked {len(documents)} documents locally using FlashRank")
-            return reranked_docs[:top_n]
+            return reranked_docs
             
         except Exception as e:
             logger.error(f"Error during local reranking: {e}")
             # Fallback to original order
             return documents[:top_n]
 
+class RerankBatcher:
+    """
+    Coalesces concurrent rerank requests into batches.
+    
+    Requests are grouped into bins by document count. A bin is flushed once it holds
+    _MAX_BATCH_REQUESTS requests or _BATCH_WINDOW_SECONDS after its first request
+    arrived, and the whole batch is scored in a worker thread.
+    """
+
+    def __init__(self, service: RerankService):
+        self.service = service
+        self._pending: Dict[int, List[Tuple[RerankJob, asyncio.Future]]] = defaultdict(list)
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        # In-flight batch tasks; held here so they aren't garbage-collected mid-run
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, query: str, documents: List[Dict[str, Any]], top_n: int) -> List[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        bin_index = bisect.bisect_left(_BATCH_BIN_BOUNDS, len(documents))
+
+        pending = self._pending[bin_index]
+        pending.append(((query, documents, top_n), future))
+        if len(pending) >= _MAX_BATCH_REQUESTS:
+            self._flush(bin_index)
+        elif bin_index not in self._timers:
+            self._timers[bin_index] = loop.call_later(_BATCH_WINDOW_SECONDS, self._flush, bin_index)
+
+        return await future
+
+    def _flush(self, bin_index: int) -> None:
+        timer = self._timers.pop(bin_index, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(bin_index, None)
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[RerankJob, asyncio.Future]]) -> None:
+        jobs = [job for job, _ in batch]
+        try:
+            loop = asyncio.get_running_loop()
+            # Model inference is CPU-bound; keep it off the event loop
+            results = await loop.run_in_executor(None, self.service.rerank_many, jobs)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
 # Singleton instance
 rerank_service = RerankService()
+_rerank_batcher = RerankBatcher(rerank_service)